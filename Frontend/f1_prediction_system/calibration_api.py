@@ -0,0 +1,614 @@
+#!/usr/bin/env python3
+"""
+F1 Calibration API Service
+Exposes the auto-calibration engine over HTTP: current parameters,
+Optuna-based optimization runs and historical data ingestion
+"""
+
+import asyncio
+import logging
+import os
+import shutil
+import tempfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+import aiofiles
+import numpy as np
+import orjson
+import pandas as pd
+import redis
+from fastapi import BackgroundTasks, FastAPI, HTTPException, Request, Response
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, Field
+import uvicorn
+
+try:
+    import optuna
+    optuna.logging.set_verbosity(optuna.logging.WARNING)
+except ImportError:  # optional: parameter optimization
+    optuna = None
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Initialize FastAPI app
+# orjson serializes every response body; endpoints returning plain dicts
+# skip FastAPI's response-model validation on the way out
+app = FastAPI(title="F1 Calibration API", version="1.0.0",
+              default_response_class=ORJSONResponse)
+
+# Oversized bodies are refused from the Content-Length header alone —
+# before the JSON is read, parsed or pushed through Pydantic
+MAX_BODY_BYTES = 65536
+
+@app.middleware("http")
+async def _reject_oversized_bodies(request: Request, call_next):
+    if int(request.headers.get("content-length") or 0) > MAX_BODY_BYTES:
+        return ORJSONResponse({"detail": "payload too large"}, status_code=413)
+    return await call_next(request)
+
+# Add CORS middleware
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+# File paths
+CONFIG_PATH = "calibration_params.json"
+# Optional RAM-backed home for the config (e.g. /dev/shm/f1_calib.json):
+# the hot path serves every read/write and a background task mirrors it
+# to CONFIG_PATH for durability
+CALIB_HOT_PATH = os.environ.get("CALIB_HOT_PATH")
+MIRROR_INTERVAL = 60.0
+HISTORY_CSV = "driver_win_probs.csv"
+HISTORY_LOG = "historical_results.jsonl"
+TS_PATH = "calibration_params.ts"
+
+# Historical-data batching
+HIST_QUEUE_SIZE = 10_000
+HIST_BATCH_SIZE = 256
+
+DEFAULT_PARAMS = {"temperature": 1.0, "shrink": 0.9}
+
+# Data models
+class CalibrationStatus(BaseModel):
+    status: str
+    current_params: Dict[str, float]
+    last_optimization: Optional[str] = None
+    best_loss: Optional[float] = None
+
+class OptimizationRequest(BaseModel):
+    n_trials: int = 50
+    study_name: str = "f1_calibration"
+    config_path: Optional[str] = None
+
+class OptimizationResponse(BaseModel):
+    task_id: str
+    status: str
+    timestamp: str
+
+class UpdateParamsRequest(BaseModel):
+    params: Dict[str, float]
+
+class HistoricalDataRequest(BaseModel):
+    race: str
+    # an F1 grid tops out in the twenties; anything past 100 entries is a
+    # broken client and gets a 422 before the values are float-coerced
+    predictions: Dict[str, float] = Field(max_length=100)
+    actual_winner: str
+
+class AutoCalibrationService:
+    """Tunes the calibration parameters against the logged win probabilities
+
+    The parameters temper and shrink the raw model probabilities; Optuna
+    searches for the pair minimizing the Brier score over the prediction
+    history exported by f1_reweighted_calibration.py.
+    """
+
+    def __init__(self, config_path: str = CONFIG_PATH):
+        self.config_path = config_path
+        self._last_best: Optional[Tuple[Dict[str, float], float]] = None
+
+    def _load_history(self) -> Optional[pd.DataFrame]:
+        try:
+            return pd.read_csv(HISTORY_CSV)
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def apply_params(df: pd.DataFrame, temperature: float, shrink: float) -> np.ndarray:
+        """Temper, shrink toward the per-race uniform prior, renormalize"""
+        eps = 1e-10
+        p = np.clip(df["win_prob_reweighted"].to_numpy(), eps, 1 - eps)
+        tempered = 1.0 / (1.0 + np.exp(-np.log(p / (1 - p)) / temperature))
+        prior = 1.0 / df.groupby("race")["driver"].transform("count").to_numpy()
+        blended = pd.Series(shrink * tempered + (1 - shrink) * prior, index=df.index)
+        return (blended / blended.groupby(df["race"]).transform("sum")).to_numpy()
+
+    def optimize(self, n_trials: int, study_name: str) -> Tuple[Dict[str, float], float]:
+        """Run the Optuna study, return (best_params, best_loss)"""
+        history = self._load_history()
+        if history is None:
+            raise RuntimeError(f"{HISTORY_CSV} not found — run f1_reweighted_calibration.py first")
+        actual = history["win"].to_numpy()
+
+        def objective(trial):
+            temperature = trial.suggest_float("temperature", 0.25, 4.0, log=True)
+            shrink = trial.suggest_float("shrink", 0.0, 1.0)
+            calibrated = self.apply_params(history, temperature, shrink)
+            return float(np.mean((calibrated - actual) ** 2))
+
+        study = optuna.create_study(direction="minimize", study_name=study_name)
+        study.optimize(objective, n_trials=n_trials)
+        # best_params and best_value each rescan the trial list; one
+        # best_trial lookup materializes both, and the result is kept on
+        # the service so later callers never re-query the study
+        best = study.best_trial
+        self._last_best = (best.params, best.value)
+        return self._last_best
+
+    async def save_parameters(self, params: Dict[str, float], best_loss: float,
+                              study_name: str) -> None:
+        config = {
+            "params": params,
+            "best_loss": best_loss,
+            "study_name": study_name,
+            "last_optimization": datetime.now().isoformat(),
+        }
+        # called from the optimization coroutine: the atomic write runs
+        # on a worker thread so the event loop never waits on the fsync
+        await asyncio.to_thread(_atomic_write_json, self.config_path, config)
+        _invalidate_config(self.config_path)
+        logger.info(f"Saved calibration parameters to {self.config_path}")
+
+    def generate_typescript_params(self, params: Dict[str, float]) -> None:
+        """Mirror the parameters into a TS constant for the frontend
+
+        The module is assembled once with a join, encoded once, and
+        renamed over the target so the frontend build never imports a
+        half-written file.
+        """
+        lines = ["// Auto-generated by calibration_api.py — do not edit",
+                 "export const CALIBRATION_PARAMS = {"]
+        for key, value in params.items():
+            lines.append(f"  {key}: {value},")
+        lines.append("} as const;")
+        payload = ("\n".join(lines) + "\n").encode("utf-8")
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(TS_PATH) or ".",
+                                   prefix=".tmp_", suffix=".ts")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(payload)
+            os.replace(tmp, TS_PATH)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except FileNotFoundError:
+                pass
+            raise
+        logger.info(f"Generated {TS_PATH}")
+
+calibration_service = AutoCalibrationService()
+
+# Parsed-config cache keyed by mtime: the status and params endpoints are
+# polled far more often than the file changes, so a hit skips the disk
+# read and the JSON parse entirely
+_config_cache: Dict[str, Tuple[int, Any]] = {}
+
+def _read_config(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    cached = _config_cache.get(path)
+    if cached is not None and cached[0] == st.st_mtime_ns:
+        return cached[1]
+    with open(path, 'rb') as f:
+        config = orjson.loads(f.read())
+    _config_cache[path] = (st.st_mtime_ns, config)
+    return config
+
+def _invalidate_config(path: str) -> None:
+    _config_cache.pop(path, None)
+
+def _atomic_write_json(path: str, data: Dict[str, Any]) -> None:
+    """Replace the config in one atomic step
+
+    The payload lands in a sibling tempfile, is fsynced, then renamed
+    over the target — a reader opening the path mid-write sees either
+    the old document or the new one, never a truncated JSON.
+    """
+    directory = os.path.dirname(path) or "."
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".tmp_", suffix=".json")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2 |
+                                 orjson.OPT_SERIALIZE_NUMPY))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+
+# In-flight and historical optimization runs (fallback store when Redis
+# is unreachable — single-worker only). Insertion-ordered so the store
+# can evict oldest-first; capped because nothing else ever removes
+# finished entries from a long-lived process
+optimization_tasks: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+MAX_LOCAL_TASKS = 1024
+
+# Ids of tasks currently running, mirroring Redis's opt:running set: the
+# active listing touches only these instead of scanning every task ever
+# submitted
+running_ids: set = set()
+
+class OptimizationTaskStore:
+    """Job store for optimization task state
+
+    Backed by Redis when one is reachable, so task state survives
+    restarts, is shared across uvicorn workers (a status poll can land on
+    a different worker than the POST that queued the run), and finished
+    entries expire on their own instead of accumulating forever. Without
+    Redis it degrades to the in-process optimization_tasks dict.
+    """
+
+    TTL_SECONDS = 86400  # finished tasks auto-expire after a day
+
+    def __init__(self, host="localhost", port=6379, db=0):
+        try:
+            self.redis = redis.Redis(host=host, port=port, db=db,
+                                     decode_responses=True)
+            self.redis.ping()
+            logger.info("Connected to Redis for optimization task state.")
+        except Exception as e:
+            logger.warning(f"Redis unavailable ({e}) — tracking optimization "
+                           f"tasks in-process.")
+            self.redis = None
+
+    def create(self, task_id: str, task: Dict[str, Any]) -> None:
+        if self.redis is None:
+            # Redis entries expire via TTL; the local dict needs its own
+            # bound. Evict the oldest finished tasks only — queued and
+            # running studies keep their records, otherwise the
+            # background run would hit a missing id when it flips a
+            # queued task to running
+            while len(optimization_tasks) >= MAX_LOCAL_TASKS:
+                stale = next((k for k, v in optimization_tasks.items()
+                              if v["status"] in ("completed", "failed")), None)
+                if stale is None:
+                    break
+                del optimization_tasks[stale]
+            optimization_tasks[task_id] = task
+            return
+        self.redis.set(f"opt:{task_id}", orjson.dumps(task))
+
+    def update(self, task_id: str, fields: Dict[str, Any]) -> None:
+        if self.redis is None:
+            # Re-materialize the record if it was ever evicted so a
+            # background run never dies on a missing id
+            task = optimization_tasks.setdefault(task_id, {"status": "queued"})
+            task.update(fields)
+            if task["status"] == "running":
+                running_ids.add(task_id)
+            else:
+                running_ids.discard(task_id)
+            return
+        task = self.get(task_id) or {}
+        task.update(fields)
+        self.redis.set(f"opt:{task_id}", orjson.dumps(task))
+        status = task.get("status")
+        if status == "running":
+            self.redis.sadd("opt:running", task_id)
+        elif status in ("completed", "failed"):
+            self.redis.srem("opt:running", task_id)
+            self.redis.expire(f"opt:{task_id}", self.TTL_SECONDS)
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        if self.redis is None:
+            return optimization_tasks.get(task_id)
+        raw = self.redis.get(f"opt:{task_id}")
+        return orjson.loads(raw) if raw is not None else None
+
+    def active(self) -> Dict[str, Dict[str, Any]]:
+        if self.redis is None:
+            return {task_id: optimization_tasks[task_id]
+                    for task_id in running_ids}
+        return {task_id: task for task_id in self.redis.smembers("opt:running")
+                if (task := self.get(task_id)) is not None}
+
+task_store = OptimizationTaskStore()
+
+# The Optuna trials are pure CPU, so they run in a worker process: the
+# API process (event loop and threadpool included) stays responsive
+# while a study grinds for minutes. Spawned lazily so plain imports of
+# this module never fork a worker.
+_optimizer_pool: Optional[ProcessPoolExecutor] = None
+
+def _get_optimizer_pool() -> ProcessPoolExecutor:
+    global _optimizer_pool
+    if _optimizer_pool is None:
+        _optimizer_pool = ProcessPoolExecutor(max_workers=1)
+    return _optimizer_pool
+
+# One in-flight run per study: duplicate POSTs coalesce onto the running
+# task instead of racing each other on the config and .ts writes
+_study_inflight: Dict[str, str] = {}
+_save_lock = asyncio.Lock()
+
+async def run_optimization_background(task_id: str, n_trials: int,
+                                      study_name: str, config_path: str):
+    """Run one optimization and record its outcome on the task entry
+
+    config_path arrives as an argument: overlapping runs each carry
+    their own destination instead of racing on the shared service's
+    attribute.
+    """
+    svc = (calibration_service
+           if config_path == calibration_service.config_path
+           else AutoCalibrationService(config_path))
+    task_store.update(task_id, {"status": "running"})
+    try:
+        loop = asyncio.get_running_loop()
+        best_params, best_loss = await loop.run_in_executor(
+            _get_optimizer_pool(), svc.optimize, n_trials, study_name)
+        # writes from overlapping runs of different studies stay ordered
+        async with _save_lock:
+            await svc.save_parameters(best_params, best_loss, study_name)
+            svc.generate_typescript_params(best_params)
+        task_store.update(task_id, {
+            "status": "completed",
+            "best_params": best_params,
+            "best_loss": best_loss,
+            "completed_at": datetime.now().isoformat(),
+        })
+        logger.info(f"Optimization {task_id} completed: loss={best_loss:.6f}")
+    except Exception as e:
+        task_store.update(task_id, {
+            "status": "failed",
+            "error": str(e),
+            "completed_at": datetime.now().isoformat(),
+        })
+        logger.error(f"Optimization {task_id} failed: {e}")
+    finally:
+        _study_inflight.pop(study_name, None)
+
+# The root payload never changes, so it is serialized exactly once at
+# import; load balancers polling these endpoints hit a canned body
+_ROOT_BODY = orjson.dumps({
+    "service": "F1 Calibration API",
+    "version": "1.0.0",
+    "endpoints": ["/health", "/calibration/status", "/calibration/params",
+                  "/calibration/optimize", "/calibration/historical"],
+})
+
+@app.get("/")
+async def root():
+    return Response(content=_ROOT_BODY, media_type="application/json")
+
+@app.get("/health")
+async def health_check():
+    return ORJSONResponse({"status": "healthy",
+                           "timestamp": datetime.now().isoformat()})
+
+# The config-backed endpoints are plain sync defs: they do blocking file
+# I/O and no awaiting, so Starlette runs them on its threadpool instead
+# of stalling the event loop behind the disk
+@app.get("/calibration/status")
+def get_calibration_status(request: Request):
+    """Current calibration state: parameters, last run, best loss
+
+    Carries the same ETag/Cache-Control pair as the params endpoint, so
+    pollers revalidate with If-None-Match and get 304s while the config
+    is unchanged.
+    """
+    path = calibration_service.config_path
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        # model_construct skips the validation pipeline — every field
+        # here is built in-process, so there is nothing to validate
+        return CalibrationStatus.model_construct(status="uncalibrated",
+                                                 current_params=DEFAULT_PARAMS)
+    etag = f'W/"{st.st_mtime_ns}-{st.st_size}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304)
+    config = _read_config(path) or {}
+    status = CalibrationStatus.model_construct(
+        status="ready",
+        current_params=config.get("params", DEFAULT_PARAMS),
+        last_optimization=config.get("last_optimization"),
+        best_loss=config.get("best_loss"),
+    )
+    return ORJSONResponse(status.model_dump(),
+                          headers={"ETag": etag,
+                                   "Cache-Control": _CACHE_CONTROL})
+
+# Dashboards poll these GETs every second or so; the config changes on a
+# minutes-to-hours cadence. Clients and reverse proxies may serve a
+# response up to 5s old and keep using a stale one for 30s while they
+# revalidate in the background
+_CACHE_CONTROL = "max-age=5, stale-while-revalidate=30"
+
+# Serialized params bodies keyed by config mtime, mirroring the parsed
+# cache: a poll of an unchanged config is served straight from bytes
+_params_body_cache: Dict[str, Tuple[int, bytes]] = {}
+
+@app.get("/calibration/params")
+def get_current_params(request: Request):
+    """The active calibration parameters
+
+    Conditional GETs are honored: the ETag is derived from the config
+    file's mtime and size, so a client replaying it via If-None-Match
+    gets a bodiless 304 and an unchanged config is never re-read,
+    re-parsed or re-serialized.
+    """
+    path = calibration_service.config_path
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return DEFAULT_PARAMS
+    etag = f'W/"{st.st_mtime_ns}-{st.st_size}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304)
+    cached = _params_body_cache.get(path)
+    if cached is not None and cached[0] == st.st_mtime_ns:
+        body = cached[1]
+    else:
+        config = _read_config(path) or {}
+        body = orjson.dumps(config.get("params", DEFAULT_PARAMS))
+        _params_body_cache[path] = (st.st_mtime_ns, body)
+    return Response(content=body, media_type="application/json",
+                    headers={"ETag": etag, "Cache-Control": _CACHE_CONTROL})
+
+@app.post("/calibration/params")
+def update_params(request: UpdateParamsRequest):
+    """Manually override calibration parameters"""
+    config = _read_config(calibration_service.config_path) or {}
+    params = dict(config.get("params", DEFAULT_PARAMS))
+    params.update(request.params)
+    config["params"] = params
+    config["last_optimization"] = config.get("last_optimization")
+    _atomic_write_json(calibration_service.config_path, config)
+    _invalidate_config(calibration_service.config_path)
+    logger.info(f"Parameters updated manually: {request.params}")
+    return {"status": "updated", "params": params}
+
+@app.post("/calibration/optimize", response_model=OptimizationResponse)
+async def start_optimization(request: OptimizationRequest,
+                             background_tasks: BackgroundTasks):
+    """Kick off a background Optuna optimization run"""
+    if optuna is None:
+        raise HTTPException(status_code=503, detail="optuna is not installed")
+
+    config_path = request.config_path or calibration_service.config_path
+
+    # Coalesce duplicates: a second POST for a study already optimizing
+    # gets the in-flight task id back instead of a second study
+    inflight = _study_inflight.get(request.study_name)
+    if inflight is not None:
+        return OptimizationResponse.model_construct(
+            task_id=inflight,
+            status="already_running",
+            timestamp=datetime.now().isoformat(),
+        )
+
+    # One clock read serves the id, the task record and the response —
+    # and the three can't disagree about when the run was queued
+    now = datetime.now()
+    queued_at = now.isoformat()
+    optimization_id = f"opt_{now.strftime('%Y%m%d_%H%M%S_%f')}"
+    task_store.create(optimization_id, {
+        "status": "queued",
+        "n_trials": request.n_trials,
+        "study_name": request.study_name,
+        "started_at": queued_at,
+    })
+    _study_inflight[request.study_name] = optimization_id
+    background_tasks.add_task(run_optimization_background, optimization_id,
+                              request.n_trials, request.study_name,
+                              config_path)
+    return OptimizationResponse.model_construct(
+        task_id=optimization_id,
+        status="queued",
+        timestamp=queued_at,
+    )
+
+@app.get("/calibration/optimize/active")
+def get_active_optimizations():
+    """All currently running optimization tasks"""
+    return task_store.active()
+
+@app.get("/calibration/optimize/{task_id}")
+def get_optimization_status(task_id: str):
+    """Status of one optimization task"""
+    task = task_store.get(task_id)
+    if task is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    return task
+
+async def _hist_consumer(queue: "asyncio.Queue"):
+    """Drain submissions in batches and persist each batch in one write
+
+    Per-request persistence would mean one random write per POST; the
+    consumer gathers up to HIST_BATCH_SIZE queued submissions and appends
+    them to the history log in a single I/O, keeping the POST handlers at
+    an in-memory put_nowait. The same drain loop feeds a batched INSERT
+    once the results database lands.
+    """
+    while True:
+        items = [await queue.get()]
+        while len(items) < HIST_BATCH_SIZE and not queue.empty():
+            items.append(queue.get_nowait())
+        try:
+            payload = b"".join(orjson.dumps(item) + b"\n" for item in items)
+            async with aiofiles.open(HISTORY_LOG, 'ab') as f:
+                await f.write(payload)
+            logger.info(f"Persisted {len(items)} historical submissions")
+        except Exception as e:
+            logger.error(f"Failed to persist historical batch: {e}")
+        finally:
+            for _ in items:
+                queue.task_done()
+
+def _mirror_config_once():
+    tmp = CONFIG_PATH + ".tmp"
+    shutil.copyfile(CALIB_HOT_PATH, tmp)
+    os.replace(tmp, CONFIG_PATH)
+
+async def _mirror_config_loop():
+    """Flush the hot config back to the durable path when it changed"""
+    last_mtime = None
+    while True:
+        await asyncio.sleep(MIRROR_INTERVAL)
+        try:
+            st = os.stat(CALIB_HOT_PATH)
+        except FileNotFoundError:
+            continue
+        if st.st_mtime_ns == last_mtime:
+            continue
+        try:
+            await asyncio.to_thread(_mirror_config_once)
+            last_mtime = st.st_mtime_ns
+        except OSError as e:
+            logger.error(f"Config mirror failed: {e}")
+
+@app.on_event("startup")
+async def _start_hist_consumer():
+    app.state.hist_queue = asyncio.Queue(maxsize=HIST_QUEUE_SIZE)
+    app.state.hist_consumer = asyncio.create_task(
+        _hist_consumer(app.state.hist_queue))
+    if CALIB_HOT_PATH:
+        # Seed the tmpfs copy from the durable one, point every endpoint
+        # at RAM, and keep the durable file trailing at most one interval
+        if os.path.exists(CONFIG_PATH) and not os.path.exists(CALIB_HOT_PATH):
+            shutil.copyfile(CONFIG_PATH, CALIB_HOT_PATH)
+        calibration_service.config_path = CALIB_HOT_PATH
+        app.state.config_mirror = asyncio.create_task(_mirror_config_loop())
+        logger.info(f"Serving calibration config from {CALIB_HOT_PATH} "
+                    f"(mirroring to {CONFIG_PATH} every {MIRROR_INTERVAL:.0f}s)")
+
+@app.post("/calibration/historical")
+async def add_historical_data(request: HistoricalDataRequest):
+    """Queue post-race outcomes for batched persistence"""
+    await app.state.hist_queue.put({
+        "race": request.race,
+        "predictions": request.predictions,
+        "actual_winner": request.actual_winner,
+        "received_at": datetime.now().isoformat(),
+    })
+    return {"status": "accepted", "race": request.race}
+
+if __name__ == "__main__":
+    uvicorn.run(app, host="0.0.0.0", port=8001)
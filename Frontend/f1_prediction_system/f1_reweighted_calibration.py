@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+F1 Reweighted Multinomial Calibration
+Trains a season-reweighted multinomial winner model over the drivers and
+exports per-driver win probabilities with a per-driver calibration grid.
+"""
+
+import pandas as pd
+import numpy as np
+import matplotlib.pyplot as plt
+from sklearn.compose import ColumnTransformer
+from sklearn.preprocessing import OneHotEncoder
+from sklearn.linear_model import LogisticRegression
+from joblib import Parallel, delayed
+from sklearn.calibration import calibration_curve
+from sklearn.metrics import brier_score_loss
+import warnings
+warnings.filterwarnings('ignore')
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+except ImportError:  # optional: streamed float32 export
+    pa = None
+
+# File paths
+DATA_CSV = "f1_training_data.csv"
+OUT_CSV = "driver_win_probs.csv"
+PLOT_FILE = "driver_calibration_grid.png"
+
+# Recency weighting
+CURRENT_SEASON = 2025
+DECAY = 0.8
+
+# Numeric features consumed alongside the team one-hot (whichever exist)
+NUMERIC_FEATURES = [
+    "grid", "qualyPosition", "ewma_points", "ewma_position",
+    "recent_form_score", "track_advantage", "total_points",
+]
+
+# Alternate source names accepted for each canonical column
+COLUMN_ALIASES = {"race": "raceName", "win": "is_winner",
+                  "team": "constructor", "driver": "driver_name"}
+
+def load_dataset():
+    """Load the training table and harmonize its column names
+
+    The header is sniffed first (nrows=0) so the real read parses only
+    the columns the model consumes, with their dtypes pinned: categorical
+    keys, int8 labels and float32 features — no inference pass and no
+    float64 materialization of discarded columns.
+    """
+    print("📊 Loading dataset for reweighted calibration...")
+    try:
+        header = pd.read_csv(DATA_CSV, nrows=0).columns
+    except FileNotFoundError:
+        print(f"  ❌ {DATA_CSV} not found — run prepare_training_data.py first")
+        return None
+
+    wanted = ["race", "driver", "win", "season", "team"] + NUMERIC_FEATURES
+    usecols, dtype, rename = [], {}, {}
+    for name in wanted:
+        src = name if name in header else COLUMN_ALIASES.get(name)
+        if src is None or src not in header:
+            continue
+        usecols.append(src)
+        if name in ("race", "driver", "team"):
+            dtype[src] = "category"
+        elif name == "win":
+            dtype[src] = np.int8
+        elif name == "season":
+            dtype[src] = np.int32
+        else:
+            dtype[src] = np.float32
+        if src != name:
+            rename[src] = name
+
+    df = pd.read_csv(DATA_CSV, usecols=usecols, dtype=dtype)
+    if rename:
+        df.rename(columns=rename, inplace=True)
+
+    required_cols = ["race", "driver", "win"]
+    missing = [c for c in required_cols if c not in df.columns]
+    if missing:
+        print(f"  ❌ Dataset missing columns: {missing}")
+        return None
+
+    if "season" not in df.columns:
+        # single-season exports carry no season column; weight them flat
+        df["season"] = CURRENT_SEASON
+
+    print(f"  ✓ Loaded {len(df)} entries, {df['driver'].nunique()} drivers")
+    return df
+
+def time_weight(season, current=CURRENT_SEASON, decay=DECAY):
+    """Recency weight for one season: decay^(seasons ago)"""
+    try:
+        age = max(0, current - int(season))
+    except (TypeError, ValueError):
+        age = 0
+    return decay ** age
+
+def _feature_frame(df):
+    """Select the model input columns, numerics cast to float32"""
+    categorical = [c for c in ("team",) if c in df.columns]
+    numeric = [c for c in NUMERIC_FEATURES if c in df.columns]
+    feats = df[categorical + numeric].copy()
+    feats[numeric] = feats[numeric].astype(np.float32)
+    return feats, categorical, numeric
+
+def train_multinomial(df):
+    """Fit the multinomial winner model on recency-weighted winner entries
+
+    The team column is one-hot encoded into a sparse CSR block
+    (sparse_threshold=1.0 keeps the stacked matrix sparse) and fed to the
+    saga solver, which consumes CSR directly — the categorical block is
+    never densified.
+    """
+    print("🎯 Training reweighted multinomial model...")
+
+    winners = df[df["win"] == 1]
+    if winners.empty:
+        print("  ❌ No winner entries in dataset")
+        return None, None
+
+    # decay^(seasons ago) in one vectorized np.power call — no per-row
+    # Python dispatch through time_weight
+    seasons = pd.to_numeric(winners["season"], errors="coerce") \
+        .fillna(CURRENT_SEASON).to_numpy(np.int32)
+    weights = np.power(DECAY, np.maximum(0, CURRENT_SEASON - seasons)) \
+        .astype(np.float32)
+
+    feats, categorical, numeric = _feature_frame(winners)
+    encoder = ColumnTransformer(
+        [("team", OneHotEncoder(handle_unknown="ignore", sparse_output=True,
+                                dtype=np.float32), categorical)],
+        remainder="passthrough", sparse_threshold=1.0,
+    )
+    X = encoder.fit_transform(feats)
+
+    model = LogisticRegression(solver="saga", max_iter=1000, random_state=42)
+    model.fit(X, winners["driver"], sample_weight=weights)
+
+    print(f"  ✓ Fitted on {len(winners)} winner entries "
+          f"({len(model.classes_)} driver classes, {X.shape[1]} features)")
+    return encoder, model
+
+def predict_win_probs(df, encoder, model):
+    """Per-entry win probabilities, renormalized within each race"""
+    print("🔮 Predicting win probabilities...")
+
+    feats, _, _ = _feature_frame(df)
+    proba = model.predict_proba(encoder.transform(feats))
+    classes = list(model.classes_)
+
+    # Each entry is scored by its own driver's class column: "how much
+    # does this entry look like a winning profile of this driver"
+    class_to_col = {c: i for i, c in enumerate(classes)}
+    col_idx = np.array([class_to_col.get(d, -1) for d in df["driver"]])
+    scores = np.where(col_idx >= 0,
+                      proba[np.arange(len(df)), np.maximum(col_idx, 0)],
+                      1e-6)
+
+    # Renormalize so probabilities sum to 1 per race
+    score_series = pd.Series(scores, index=df.index)
+    win_probs = (score_series / score_series.groupby(df["race"]).transform("sum")).to_numpy()
+
+    return win_probs, proba, classes
+
+def export_win_probs(df, win_probs, proba, classes):
+    """Write the per-driver probability table to OUT_CSV
+
+    With pyarrow the export streams 100k-row record batches with float32
+    probability columns, so the dense (N x K) float64 DataFrame that
+    pd.concat would materialize never exists.
+    """
+    if pa is None:
+        proba_df = pd.DataFrame(proba, columns=[f"prob_{c}" for c in classes])
+        out = pd.concat([
+            df[["race", "driver", "win"]].reset_index(drop=True),
+            pd.Series(win_probs, name="win_prob_reweighted"),
+            proba_df,
+        ], axis=1)
+        out.to_csv(OUT_CSV, index=False)
+        print(f"💾 Win probabilities saved to: {OUT_CSV}")
+        return
+
+    names = ["race", "driver", "win", "win_prob_reweighted"] + \
+            [f"prob_{c}" for c in classes]
+    race = df["race"].astype(str).to_numpy()
+    driver = df["driver"].astype(str).to_numpy()
+    win = df["win"].to_numpy(np.int8)
+    win_probs32 = win_probs.astype(np.float32)
+    proba32 = proba.astype(np.float32)
+
+    schema = pa.schema(
+        [("race", pa.string()), ("driver", pa.string()), ("win", pa.int8()),
+         ("win_prob_reweighted", pa.float32())] +
+        [(f"prob_{c}", pa.float32()) for c in classes])
+
+    with pacsv.CSVWriter(OUT_CSV, schema) as writer:
+        for start in range(0, len(df), 100_000):
+            end = start + 100_000
+            arrays = [pa.array(race[start:end]), pa.array(driver[start:end]),
+                      pa.array(win[start:end]), pa.array(win_probs32[start:end])]
+            arrays += [pa.array(proba32[start:end, j]) for j in range(len(classes))]
+            writer.write_batch(pa.record_batch(arrays, names=names))
+    print(f"💾 Win probabilities saved to: {OUT_CSV}")
+
+def plot_driver_calibration(df, win_probs, proba, classes):
+    """Per-driver calibration grid for the reweighted win probabilities"""
+    print("📈 Plotting per-driver calibration...")
+
+    # One categorical pass replaces a fresh string comparison per driver:
+    # each mask is an int-code equality, and the wins-per-driver bincount
+    # hoists the "no wins" test out of the masked arrays
+    cat = pd.Categorical(df["driver"])
+    codes = np.asarray(cat.codes)
+    win = df["win"].to_numpy(bool)
+    drivers = list(cat.categories)  # sorted, NaN excluded (code -1)
+    wins_per_driver = np.bincount(codes[win & (codes >= 0)],
+                                  minlength=len(drivers))
+    # O(1) class-column lookups instead of list.index per driver
+    class_to_col = {c: i for i, c in enumerate(classes)}
+    rows, cols = 5, 4
+
+    # The per-driver calibration curves are independent pure-NumPy work,
+    # so compute them across cores up front (threads — the NumPy kernels
+    # release the GIL) and keep matplotlib on the main thread
+    def _curve(i):
+        try:
+            return calibration_curve(win[codes == i], win_probs[codes == i],
+                                     n_bins=5, strategy="uniform")
+        except Exception as e:
+            print(f"    ⚠️  Calibration curve failed for {drivers[i]}: {e}")
+            return None
+
+    curve_idx = [i for i in range(min(len(drivers), rows * cols))
+                 if wins_per_driver[i] > 0]
+    curves = dict(zip(curve_idx, Parallel(n_jobs=-1, prefer="threads")(
+        delayed(_curve)(i) for i in curve_idx)))
+
+    plt.figure(figsize=(20, 16))
+    plt.suptitle("Reweighted Win Probability Calibration (per driver)",
+                 fontsize=18, y=0.98)
+
+    for i, dv in enumerate(drivers[:rows * cols]):
+        plt.subplot(rows, cols, i + 1)
+
+        mask = codes == i
+        y_true = win[mask]
+        y_prob = win_probs[mask]
+
+        if wins_per_driver[i] == 0:
+            plt.title(f"{dv}\n(no wins)")
+            plt.axis("off")
+            continue
+
+        if curves.get(i) is None:
+            plt.axis("off")
+            continue
+        pt, pp = curves[i]
+        plt.plot(pp, pt, marker="o", linewidth=2)
+
+        plt.plot([0, 1], [0, 1], "k--", alpha=0.5)
+
+        brier = brier_score_loss(y_true, y_prob)
+        col = class_to_col.get(dv)
+        model_mean = proba[mask, col].mean() if col is not None else np.nan
+        txt = f"Brier {brier:.4f}\nModel mean {model_mean:.3f}"
+        plt.text(0.02, 0.98, txt, transform=plt.gca().transAxes,
+                 ha="left", va="top", fontsize=9,
+                 bbox=dict(boxstyle="round,pad=0.3", fc="#eef", ec="#99c", alpha=0.9))
+
+        plt.title(dv, fontsize=11, fontweight='bold')
+        plt.xlabel("Predicted Probability")
+        plt.ylabel("Observed Frequency")
+        plt.grid(alpha=0.25)
+
+    # Hide empty subplots
+    for i in range(len(drivers[:rows * cols]), rows * cols):
+        plt.subplot(rows, cols, i + 1)
+        plt.axis("off")
+
+    plt.tight_layout(rect=[0, 0, 1, 0.96])
+    plt.savefig(PLOT_FILE, dpi=160, bbox_inches='tight')
+    plt.close()
+    print(f"  💾 Calibration grid saved as {PLOT_FILE}")
+
+def main():
+    """Main reweighted calibration pipeline"""
+    print("🏎️  F1 Reweighted Multinomial Calibration")
+    print("=" * 60)
+
+    df = load_dataset()
+    if df is None:
+        return
+
+    encoder, model = train_multinomial(df)
+    if model is None:
+        return
+
+    win_probs, proba, classes = predict_win_probs(df, encoder, model)
+
+    export_win_probs(df, win_probs, proba, classes)
+
+    plot_driver_calibration(df, win_probs, proba, classes)
+
+    print("\n✅ Reweighted calibration complete!")
+
+if __name__ == "__main__":
+    main()
@@ -21,6 +21,7 @@ import argparse
 import os
 import shutil
 import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
 from typing import List, Optional
@@ -30,7 +31,23 @@ import pandas as pd
 from sklearn.isotonic import IsotonicRegression
 from sklearn.linear_model import LogisticRegression
 from sklearn.calibration import calibration_curve
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+
+try:
+    import numexpr as ne
+except ImportError:  # optional: fused single-pass arithmetic
+    ne = None
+
+try:
+    import pyarrow  # noqa: F401  (optional: multithreaded CSV tokenizer)
+    _CSV_ENGINE = "pyarrow"
+except ImportError:
+    _CSV_ENGINE = "c"
+
+
+def read_csv_fast(path: Path) -> pd.DataFrame:
+    """pd.read_csv with the multithreaded pyarrow tokenizer when available."""
+    return pd.read_csv(path, engine=_CSV_ENGINE)
 
 
 BASE_DIR = Path(__file__).resolve().parent
@@ -66,48 +83,88 @@ def brier_score(y_true: np.ndarray, y_prob: np.ndarray) -> float:
 def log_loss_safe(y_true: np.ndarray, y_prob: np.ndarray, eps: float = 1e-15) -> float:
     y_prob = np.clip(np.asarray(y_prob, dtype=float), eps, 1 - eps)
     y_true = np.asarray(y_true, dtype=int)
-    return float(-np.mean(y_true * np.log(y_prob) + (1 - y_true) * np.log(1 - y_prob)))
+    # cross-entropy on the logit scale: -log(1-p) == logaddexp(0, logit),
+    # which is overflow-safe and one full-array pass cheaper than
+    # y*log(p) + (1-y)*log(1-p)
+    logit = np.log(y_prob) - np.log1p(-y_prob)
+    return float(np.mean(np.logaddexp(0.0, logit) - y_true * logit))
+
+
+# Plot rendering is independent of the calibration loop; dispatch it to a small
+# pool so PNG encoding overlaps the next event's parse + fit.
+_PLOT_POOL = ThreadPoolExecutor(max_workers=2)
+_PLOT_FUTURES: List[Future] = []
 
 
 def save_calibration_plot(y_true: np.ndarray, y_prob: np.ndarray, event_id: str) -> None:
     try:
         prob_true, prob_pred = calibration_curve(y_true, y_prob, n_bins=10, strategy="uniform")
         (EVAL_DIR / "plots").mkdir(parents=True, exist_ok=True)
-        plt.figure(figsize=(5, 5))
-        plt.plot(prob_pred, prob_true, marker="o", label="Calibrated")
-        plt.plot([0, 1], [0, 1], "k--", label="Perfect")
-        plt.xlabel("Predicted probability")
-        plt.ylabel("True frequency")
-        plt.title(f"Calibration - {event_id}")
-        plt.legend()
-        plt.tight_layout()
-        plt.savefig(EVAL_DIR / "plots" / f"calibration_{event_id}.png")
-        plt.close()
+        # object-oriented Agg API: safe to call off the main thread
+        fig = Figure(figsize=(5, 5))
+        ax = fig.add_subplot()
+        ax.plot(prob_pred, prob_true, marker="o", label="Calibrated")
+        ax.plot([0, 1], [0, 1], "k--", label="Perfect")
+        ax.set_xlabel("Predicted probability")
+        ax.set_ylabel("True frequency")
+        ax.set_title(f"Calibration - {event_id}")
+        ax.legend()
+        fig.tight_layout()
+        fig.savefig(EVAL_DIR / "plots" / f"calibration_{event_id}.png")
     except Exception:
         # plotting is best-effort
         pass
 
 
+def submit_calibration_plot(y_true: np.ndarray, y_prob: np.ndarray, event_id: str) -> None:
+    _PLOT_FUTURES.append(_PLOT_POOL.submit(save_calibration_plot, y_true.copy(), y_prob.copy(), event_id))
+
+
+def wait_for_plots() -> None:
+    while _PLOT_FUTURES:
+        _PLOT_FUTURES.pop().result()
+
+
 def encode_track_categories(tf: pd.DataFrame) -> pd.DataFrame:
     if tf.empty:
         return tf
-    mapping = {"low": 0, "medium": 1, "med": 1, "high": 2}
     out = tf.copy()
     for col in ["downforce", "power", "tyre_wear", "braking", "overtaking"]:
-        if col in out.columns:
-            out[col] = out[col].astype(str).str.strip().str.lower().map(mapping).fillna(out[col])
-            out[col] = pd.to_numeric(out[col], errors="ignore")
+        if col not in out.columns:
+            continue
+        # single-pass integer encoding via categorical codes (low/medium/high → 0/1/2)
+        norm = out[col].astype(str).str.strip().str.lower()
+        codes = np.asarray(pd.Categorical(norm, categories=["low", "medium", "high"]).codes).copy()
+        codes[(norm == "med").to_numpy()] = 1  # accepted alias for "medium"
+        unknown = codes < 0
+        if not unknown.any():
+            out[col] = codes.astype("int8")
+        else:
+            # -1 → fall back to the original value (may already be numeric)
+            fallback = pd.Series(codes, index=out.index).mask(unknown, out[col])
+            try:
+                out[col] = pd.to_numeric(fallback)
+            except (ValueError, TypeError):
+                out[col] = fallback
     return out
 
 
+# Parsed track features keyed by file mtime, so daemon cycles skip the
+# CSV parse + categorical encode when the file is unchanged.
+_TF_CACHE = {"mtime": None, "df": None}
+
+
 def load_track_features() -> pd.DataFrame:
     if not TRACK_FEATURES_FILE.exists():
         raise FileNotFoundError(f"Missing track features: {TRACK_FEATURES_FILE}")
-    tf = pd.read_csv(TRACK_FEATURES_FILE)
-    if "event_id" not in tf.columns:
-        raise ValueError("track_features.csv must contain 'event_id'")
-    tf = encode_track_categories(tf)
-    return tf
+    mtime = TRACK_FEATURES_FILE.stat().st_mtime
+    if _TF_CACHE["mtime"] != mtime:
+        tf = read_csv_fast(TRACK_FEATURES_FILE)
+        if "event_id" not in tf.columns:
+            raise ValueError("track_features.csv must contain 'event_id'")
+        _TF_CACHE["df"] = encode_track_categories(tf)
+        _TF_CACHE["mtime"] = mtime
+    return _TF_CACHE["df"]
 
 
 def expand_features(preds: pd.DataFrame, tf: pd.DataFrame) -> pd.DataFrame:
@@ -129,11 +186,25 @@ def expand_features(preds: pd.DataFrame, tf: pd.DataFrame) -> pd.DataFrame:
         df["upgrade_bonus"] = 0.0
     # pre-calibration adjusted prob (light-touch)
     prob_col = "raw_win_prob" if "raw_win_prob" in df.columns else df.filter(like="prob").columns[0]
-    base = df[prob_col].astype(float).clip(0.0, 1.0)
-    df["adjusted_prob"] = (base * (1.0 + df["upgrade_bonus"] + (df["chaos_factor"] - 0.5) * 0.2)).clip(0.0, 1.0)
+    base = df[prob_col].astype(float).clip(0.0, 1.0).to_numpy()
+    u = df["upgrade_bonus"].to_numpy(dtype=float)
+    c = df["chaos_factor"].to_numpy(dtype=float)
+    if ne is not None:
+        # fused into one SIMD-vectorized pass, no intermediate arrays
+        adjusted = ne.evaluate("base * (1.0 + u + (c - 0.5) * 0.2)")
+    else:
+        adjusted = base * (1.0 + u + (c - 0.5) * 0.2)
+    df["adjusted_prob"] = np.clip(adjusted, 0.0, 1.0)
     return df
 
 
+# Reused calibrator instances: per-event frames are tiny (C <= 20), so model
+# construction and argument validation dominate the actual fit. warm_start
+# lets the Platt solver start from the previous event's coefficients.
+_ISO = IsotonicRegression(out_of_bounds="clip")
+_PLATT = LogisticRegression(solver="lbfgs", max_iter=200, warm_start=True)
+
+
 def calibrate_event(df: pd.DataFrame, method: str = "isotonic") -> pd.DataFrame:
     if "actual_outcome" not in df.columns or df["actual_outcome"].isna().all():
         # no labels yet → pass-through
@@ -142,19 +213,18 @@ def calibrate_event(df: pd.DataFrame, method: str = "isotonic") -> pd.DataFrame:
     X = df["adjusted_prob"].values.reshape(-1, 1)
     y = df["actual_outcome"].astype(int).values
     if method == "platt":
-        model = LogisticRegression(solver="lbfgs", max_iter=200)
-        model.fit(X, y)
-        df["calibrated_prob"] = model.predict_proba(X)[:, 1]
+        _PLATT.fit(X, y)
+        df["calibrated_prob"] = _PLATT.predict_proba(X)[:, 1]
     else:
-        model = IsotonicRegression(out_of_bounds="clip")
-        model.fit(df["adjusted_prob"].values, y)
-        df["calibrated_prob"] = model.predict(df["adjusted_prob"].values)
+        _ISO.fit(df["adjusted_prob"].values, y)
+        df["calibrated_prob"] = _ISO.predict(df["adjusted_prob"].values)
     return df
 
 
-def process_event_file(path: Path, tf: pd.DataFrame) -> Optional[Path]:
+def load_event_file(path: Path) -> Optional[pd.DataFrame]:
+    """Read one predictions_<event_id>.csv and normalize its columns."""
     event_id = path.name.replace("predictions_", "").replace(".csv", "")
-    df = pd.read_csv(path)
+    df = read_csv_fast(path)
     if "event_id" not in df.columns:
         df["event_id"] = event_id
     if "raw_win_prob" not in df.columns:
@@ -164,10 +234,11 @@ def process_event_file(path: Path, tf: pd.DataFrame) -> Optional[Path]:
             print(f"  ✖ {path.name}: no numeric probability column found")
             return None
         df = df.rename(columns={num_cols[0]: "raw_win_prob"})
+    return df
 
-    df = expand_features(df, tf)
-    df = calibrate_event(df, method="isotonic")
 
+def finalize_event(event_id: str, df: pd.DataFrame, path: Path) -> Path:
+    """Evaluate, save and archive one calibrated event frame."""
     # Evaluate if labels available
     if "actual_outcome" in df.columns and df["actual_outcome"].notna().any():
         y = df["actual_outcome"].astype(int).values
@@ -182,8 +253,8 @@ def process_event_file(path: Path, tf: pd.DataFrame) -> Optional[Path]:
             row.to_csv(out_metrics, mode="a", header=False, index=False)
         else:
             row.to_csv(out_metrics, index=False)
-        # save plot
-        save_calibration_plot(y, p, event_id)
+        # save plot (rendered in the background)
+        submit_calibration_plot(y, p, event_id)
 
         # simple trigger
         if brier > BRIER_TRIGGER or logl > LOGLOSS_TRIGGER:
@@ -203,17 +274,52 @@ def process_event_file(path: Path, tf: pd.DataFrame) -> Optional[Path]:
     return out_path
 
 
+def process_event_file(path: Path, tf: pd.DataFrame) -> Optional[Path]:
+    """Single-file entry point (load → expand → calibrate → finalize)."""
+    df = load_event_file(path)
+    if df is None:
+        return None
+    event_id = str(df["event_id"].iloc[0])
+    df = expand_features(df, tf)
+    df = calibrate_event(df, method="isotonic")
+    return finalize_event(event_id, df, path)
+
+
 def run_once() -> None:
     tf = load_track_features()
     files: List[Path] = [p for p in RAW_DIR.glob("predictions_*.csv")]
     if not files:
         print("⚠️  No raw prediction files found (data/raw/predictions_*.csv)")
         return
+
+    # Load everything up front and run one stacked expand/calibrate pass,
+    # instead of paying the per-event sklearn/pandas fixed overhead in a loop.
+    frames: List[pd.DataFrame] = []
+    paths: dict[str, Path] = {}
     for f in sorted(files):
         try:
-            process_event_file(f, tf)
+            df = load_event_file(f)
         except Exception as e:
             print(f"  ✖ Failed {f.name}: {e}")
+            continue
+        if df is None:
+            continue
+        event_id = str(df["event_id"].iloc[0])
+        paths[event_id] = f
+        frames.append(df)
+    if not frames:
+        return
+
+    stacked = expand_features(pd.concat(frames, ignore_index=True), tf)
+    # isotonic calibration stays per-event: fit within each event group
+    stacked = stacked.groupby("event_id", group_keys=False)[stacked.columns].apply(calibrate_event)
+
+    for event_id, df in stacked.groupby("event_id", sort=True):
+        try:
+            finalize_event(str(event_id), df.reset_index(drop=True), paths[str(event_id)])
+        except Exception as e:
+            print(f"  ✖ Failed {paths[str(event_id)].name}: {e}")
+    wait_for_plots()
 
 
 def main() -> int:
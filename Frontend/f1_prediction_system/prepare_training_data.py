@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+Prepare F1 Training Data
+Builds the model-ready feature table from the fetched 2025 season data
+"""
+
+import argparse
+
+import pandas as pd
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:  # optional: JIT-compiled EWMA kernel
+    njit = None
+
+try:
+    import polars as pl
+except ImportError:  # optional: lazy columnar engine for --engine polars
+    pl = None
+
+# Configuration
+RACE_RESULTS_CSV = "2025_race_results.csv"
+QUALI_RESULTS_CSV = "2025_qualifying_results.csv"
+DRIVER_STANDINGS_CSV = "2025_driver_standings.csv"
+OUTPUT_CSV = "f1_training_data.csv"
+TRACK_BASELINES_CSV = "driver_track_baselines.csv"
+DRIVER_STATS_CSV = "driver_statistics.csv"
+FEATURE_COLUMNS_CSV = "feature_columns.csv"
+FEATURE_SUMMARY_CSV = "feature_summary.csv"
+EWMA_ALPHA = 0.4
+
+def load_data():
+    """Load race, qualifying and standings data
+
+    Explicit usecols/dtype schemas skip pandas' type inference pass and
+    leave the unused metadata columns (circuit, date, session times, ...)
+    unparsed. grid/position stay untyped: they can hold 'DNF'-style
+    strings and are coerced during cleaning.
+    """
+    print("📁 Loading season data...")
+    race_df = pd.read_csv(
+        RACE_RESULTS_CSV,
+        usecols=['round', 'raceName', 'driver', 'grid', 'position', 'points', 'fastestLap'],
+        dtype={'round': np.int16, 'points': np.float32, 'fastestLap': np.float32,
+               'raceName': 'category'},
+    )
+    quali_df = pd.read_csv(
+        QUALI_RESULTS_CSV,
+        usecols=['round', 'driver', 'qualyPosition'],
+        dtype={'round': np.int16, 'qualyPosition': np.float32},
+    )
+    driver_standings = pd.read_csv(
+        DRIVER_STANDINGS_CSV,
+        usecols=['driver', 'points', 'wins', 'podiums'],
+        dtype={'points': np.float32, 'wins': np.int16, 'podiums': np.int16},
+    )
+    print(f"  ✓ {len(race_df)} race results, {len(quali_df)} qualifying results")
+    return race_df, quali_df, driver_standings
+
+def clean_and_prepare_data(race_df, quali_df, driver_standings):
+    """Clean the raw frames and merge them into one race-level table"""
+    print("🧹 Cleaning and merging data...")
+    race_df['driver'] = race_df['driver'].str.strip()
+    quali_df['driver'] = quali_df['driver'].str.strip()
+    driver_standings['driver'] = driver_standings['driver'].str.strip()
+
+    # One shared categorical dtype for the merge/groupby key: every
+    # downstream join and groupby hashes small integer codes instead of
+    # re-hashing the driver strings on each operation
+    all_drivers = race_df['driver'].unique()
+    for frame in (race_df, quali_df, driver_standings):
+        frame['driver'] = pd.Categorical(frame['driver'], categories=all_drivers)
+
+    # Attach qualifying position to each race entry
+    df = race_df.merge(
+        quali_df[['round', 'driver', 'qualyPosition']],
+        on=['round', 'driver'], how='left'
+    )
+
+    # Attach season totals from the championship standings: three mapped
+    # lookups against a driver-indexed frame instead of a rename-copy plus
+    # a full merge rebuild for three columns
+    ds_idx = driver_standings.set_index('driver')
+    df['total_points'] = ds_idx['points'].reindex(df['driver']).to_numpy()
+    df['total_wins'] = ds_idx['wins'].reindex(df['driver']).to_numpy()
+    df['total_podiums'] = ds_idx['podiums'].reindex(df['driver']).to_numpy()
+
+    df['position'] = pd.to_numeric(df['position'], errors='coerce')
+    df['grid'] = pd.to_numeric(df['grid'], errors='coerce')
+    df = df.dropna(subset=['position'])
+
+    # Sort once here; every later groupby runs with sort=False against
+    # this ordering instead of re-sorting its keys
+    df = df.sort_values(['driver', 'round'])
+
+    print(f"  ✓ {len(df)} clean race entries")
+    return df
+
+if njit is not None:
+    @njit(cache=True)
+    def _ewma_grouped(values, codes, n_groups, alpha):
+        """adjust=False EWMA over driver-sorted (n_rows, n_metrics) values
+
+        One traversal updates every metric column simultaneously, so points
+        and position form share a single pass over the grouped data.
+        """
+        n_rows, n_metrics = values.shape
+        out = np.empty_like(values)
+        last = np.full((n_groups, n_metrics), np.nan)
+        for i in range(n_rows):
+            c = codes[i]
+            for m in range(n_metrics):
+                if np.isnan(last[c, m]):
+                    out[i, m] = values[i, m]
+                else:
+                    out[i, m] = alpha * values[i, m] + (1.0 - alpha) * last[c, m]
+                last[c, m] = out[i, m]
+        return out
+
+def calculate_recency_weights(df):
+    """Add recency-weighted (EWMA) form columns per driver"""
+    print("📈 Calculating recency-weighted form...")
+    df['position_inverted'] = 21 - df['position'].to_numpy()
+
+    if njit is not None:
+        # JIT'd scalar loop over contiguous arrays: skips pandas' per-group
+        # window machinery entirely, both metrics in one traversal
+        codes, uniques = pd.factorize(df['driver'], sort=False)
+        values = df[['points', 'position_inverted']].to_numpy(np.float64)
+        ewma = _ewma_grouped(values, codes, len(uniques), EWMA_ALPHA)
+        df['ewma_points'] = ewma[:, 0]
+        df['ewma_position'] = ewma[:, 1]
+    else:
+        # Native groupby-EWM: one C-level pass over both columns, no per-group
+        # Python dispatch or group copies
+        ewma = (
+            df.groupby('driver', sort=False, observed=True)[['points', 'position_inverted']]
+            .ewm(alpha=EWMA_ALPHA, adjust=False)
+            .mean()
+            .reset_index(level=0, drop=True)
+        )
+        df['ewma_points'] = ewma['points']
+        df['ewma_position'] = ewma['position_inverted']
+
+    print(f"  ✓ EWMA form computed for {df['driver'].nunique()} drivers")
+    return df
+
+def build_race_frame_polars():
+    """Load, clean and EWMA-weight the season in one lazy Polars plan
+
+    Fuses load_data, clean_and_prepare_data and calculate_recency_weights
+    into a single multi-threaded query; collected once and handed back to
+    the pandas aggregation stages.
+    """
+    print("📁 Building race frame with Polars...")
+    quali = (
+        pl.scan_csv(QUALI_RESULTS_CSV)
+        .select([pl.col('driver').str.strip_chars(), 'round', 'qualyPosition'])
+    )
+    standings = (
+        pl.scan_csv(DRIVER_STANDINGS_CSV)
+        .select([
+            pl.col('driver').str.strip_chars(),
+            pl.col('points').alias('total_points'),
+            pl.col('wins').alias('total_wins'),
+            pl.col('podiums').alias('total_podiums'),
+        ])
+    )
+    plan = (
+        pl.scan_csv(RACE_RESULTS_CSV)
+        .with_columns(pl.col('driver').str.strip_chars())
+        .join(quali, on=['round', 'driver'], how='left')
+        .join(standings, on='driver', how='left')
+        # grid/position can hold 'DNF'-style strings; non-strict casts
+        # null them out like the pandas path's to_numeric(errors='coerce')
+        .with_columns([
+            pl.col('position').cast(pl.Float64, strict=False),
+            pl.col('grid').cast(pl.Float64, strict=False),
+        ])
+        .drop_nulls('position')
+        .sort(['driver', 'round'])
+        .with_columns((21 - pl.col('position')).alias('position_inverted'))
+        .with_columns([
+            pl.col('points').ewm_mean(alpha=EWMA_ALPHA, adjust=False).over('driver').alias('ewma_points'),
+            pl.col('position_inverted').ewm_mean(alpha=EWMA_ALPHA, adjust=False).over('driver').alias('ewma_position'),
+        ])
+    )
+    df = plan.collect().to_pandas()
+    print(f"  ✓ {len(df)} clean race entries (EWMA form included)")
+    return df
+
+def calculate_track_performance(df):
+    """Per-driver, per-track performance baselines"""
+    print("🏟️  Calculating track-specific baselines...")
+    # named aggregations emit flat columns directly — no MultiIndex flatten
+    track_perf = df.groupby(['driver', 'raceName'], sort=False, observed=True).agg(
+        track_mean_points=('points', 'mean'),
+        track_std_points=('points', 'std'),
+        track_mean_position=('position', 'mean'),
+        track_mean_grid=('grid', 'mean'),
+    ).reset_index()
+
+    # Wide driver × race matrix consumed by the Monte Carlo simulator
+    track_baseline = track_perf.pivot(
+        index='driver', columns='raceName', values='track_mean_points'
+    ).fillna(0)
+
+    print(f"  ✓ Baselines for {len(track_baseline)} drivers across {track_baseline.shape[1]} tracks")
+    return track_perf, track_baseline
+
+def calculate_driver_stats(df):
+    """Season-level statistics per driver"""
+    print("👤 Calculating driver statistics...")
+    driver_stats = df.groupby('driver', sort=False, observed=True).agg(
+        races_completed=('round', 'nunique'),
+        mean_points_per_race=('points', 'mean'),
+        std_points_per_race=('points', 'std'),
+        sum_points=('points', 'sum'),
+        mean_position=('position', 'mean'),
+        std_position=('position', 'std'),
+        mean_grid=('grid', 'mean'),
+        std_grid=('grid', 'std'),
+        mean_quali_position=('qualyPosition', 'mean'),
+        std_quali_position=('qualyPosition', 'std'),
+        ewma_points=('ewma_points', 'last'),
+        ewma_position=('ewma_position', 'last'),
+    ).reset_index()
+
+    # Consistency: lower spread maps to a score closer to 1. One ndarray
+    # pass over the stacked std columns instead of three aligned Series ops
+    stds = driver_stats[['std_position', 'std_quali_position', 'std_grid']].to_numpy()
+    driver_stats[['position_consistency', 'quali_consistency', 'grid_consistency']] = 1.0 / (1.0 + stds)
+
+    wins = df[df['position'] == 1].groupby('driver', sort=False, observed=True).size()
+    podiums = df[df['position'] <= 3].groupby('driver', sort=False, observed=True).size()
+    counts = np.column_stack([
+        wins.reindex(driver_stats['driver'], fill_value=0).to_numpy(),
+        podiums.reindex(driver_stats['driver'], fill_value=0).to_numpy(),
+    ])
+    driver_stats[['win_rate', 'podium_rate']] = (
+        counts / driver_stats['races_completed'].to_numpy()[:, None]
+    )
+
+    print(f"  ✓ Statistics for {len(driver_stats)} drivers")
+    return driver_stats
+
+def create_final_features(df, track_perf, driver_stats):
+    """Merge everything into the final training feature table"""
+    print("🛠️  Building final feature table...")
+    # broadcast the small keyed frames onto the feature rows via indexed
+    # joins — no merge-machinery rehash of the full frame per lookup table.
+    # join already returns a new frame, so no defensive copy of df first
+    features = df.join(
+        track_perf.set_index(['driver', 'raceName']), on=['driver', 'raceName']
+    )
+
+    # Season stats (row-level EWMA columns already exist on the frame)
+    stat_cols = [c for c in driver_stats.columns if c not in ('driver', 'ewma_points', 'ewma_position')]
+    features = features.join(
+        driver_stats.set_index('driver')[stat_cols], on='driver'
+    )
+
+    # Derived features
+    features['recent_form_score'] = features['ewma_points'] / 25.0
+    features['qualifying_advantage'] = features['grid'] - features['qualyPosition']
+    features['track_advantage'] = features['track_mean_points'] - features['mean_points_per_race']
+    features['weather_impact'] = 1.0  # neutral until weather ingestion lands
+
+    # Target labels: one read of the position array, int8 columns (the
+    # labels are 0/1, no need for 8-byte ints)
+    pos = features['position'].to_numpy()
+    features['is_winner'] = (pos == 1).astype(np.int8)
+    features['is_podium'] = (pos <= 3).astype(np.int8)
+    features['is_points'] = (pos <= 10).astype(np.int8)
+
+    # Fill merge gaps with defaults — only the joined/derived columns, the
+    # left-merged quali/standings columns and the DNF-coerced grid can hold
+    # NaN, so don't scan (and temporarily duplicate) every numeric column in
+    # the frame. Keep this whitelist in sync with any column that
+    # clean_and_prepare_data coerces with errors='coerce'.
+    fill_cols = [c for c in features.columns if c not in df.columns]
+    fill_cols += [c for c in ('grid', 'qualyPosition', 'total_points', 'total_wins', 'total_podiums', 'fastestLap')
+                  if c in features.columns]
+    features[fill_cols] = features[fill_cols].fillna(0)
+
+    print(f"  ✓ {len(features)} rows × {len(features.columns)} columns")
+    return features
+
+def _write_csv(df, path):
+    """Write a frame to CSV via pyarrow's multi-threaded writer when available
+
+    pyarrow serializes wide numeric frames several times faster than the
+    pandas CSV writer; pandas remains the fallback.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.csv as pacsv
+        pacsv.write_csv(pa.Table.from_pandas(df, preserve_index=False), path)
+    except ImportError:
+        df.to_csv(path, index=False)
+
+def save_training_data(features, track_baseline, driver_stats):
+    """Write the training table and its supporting files"""
+    print("💾 Saving training data...")
+    _write_csv(features, OUTPUT_CSV)
+    _write_csv(track_baseline.reset_index(), TRACK_BASELINES_CSV)
+    _write_csv(driver_stats, DRIVER_STATS_CSV)
+
+    # Typed Parquet snapshots alongside the CSVs: downstream steps that can
+    # read them skip CSV tokenization and dtype inference entirely
+    try:
+        features.to_parquet(OUTPUT_CSV.replace('.csv', '.parquet'), compression='zstd')
+        driver_stats.to_parquet(DRIVER_STATS_CSV.replace('.csv', '.parquet'), compression='zstd')
+    except ImportError:
+        pass  # no parquet engine installed; CSVs remain the source of truth
+
+    # Model feature list (numeric, minus targets and raw outcome columns)
+    feature_columns = [
+        c for c in features.select_dtypes(include=[np.number]).columns
+        if c not in ('is_winner', 'is_podium', 'is_points', 'position', 'points')
+    ]
+    pd.DataFrame({'feature': feature_columns}).to_csv(FEATURE_COLUMNS_CSV, index=False)
+
+    # one notna scan yields both counts; null_count is just the complement
+    non_null = features.notna().sum()
+    feature_summary = pd.DataFrame({
+        'feature': features.columns,
+        'type': features.dtypes.astype(str).values,
+        'non_null_count': non_null.values,
+        'null_count': len(features) - non_null.values,
+    })
+    feature_summary.to_csv(FEATURE_SUMMARY_CSV, index=False)
+
+    print(f"  ✓ {OUTPUT_CSV} ({len(features)} rows, {len(feature_columns)} model features)")
+    print(f"  ✓ {TRACK_BASELINES_CSV}, {DRIVER_STATS_CSV}, {FEATURE_COLUMNS_CSV}, {FEATURE_SUMMARY_CSV}")
+
+def main():
+    """Main training data preparation pipeline"""
+    parser = argparse.ArgumentParser(description="Prepare F1 training data")
+    parser.add_argument("--engine", choices=["pandas", "polars"], default="pandas",
+                        help="polars runs load/clean/EWMA as one lazy fused plan")
+    args = parser.parse_args()
+
+    print("🏎️  F1 Training Data Preparation")
+    print("=" * 50)
+
+    if args.engine == "polars" and pl is not None:
+        df = build_race_frame_polars()
+    else:
+        if args.engine == "polars":
+            print("  ⚠️  polars not installed, falling back to pandas")
+        race_df, quali_df, driver_standings = load_data()
+        df = clean_and_prepare_data(race_df, quali_df, driver_standings)
+        df = calculate_recency_weights(df)
+    track_perf, track_baseline = calculate_track_performance(df)
+    driver_stats = calculate_driver_stats(df)
+    features = create_final_features(df, track_perf, driver_stats)
+    save_training_data(features, track_baseline, driver_stats)
+
+    print("\n✅ Training data preparation complete!")
+    print("\nNext steps:")
+    print("  1. Run train_model.py")
+    print("  2. Run monte_carlo_simulator.py")
+
+if __name__ == "__main__":
+    main()
@@ -1,32 +1,36 @@
 #!/usr/bin/env python3
 """F1 Prediction Model: Master Calibration Pipeline"""
-import subprocess
-import sys
+import importlib
 import time
 from pathlib import Path
-import os
 
-def run_script(script_name, description):
-    """Run a Python script and handle errors"""
+def run_stage(module_name, description):
+    """Run a pipeline stage in-process by importing its module
+
+    The stages pass data between each other through their CSV checkpoints,
+    but running them as imports instead of subprocesses saves an interpreter
+    startup and a full pandas/sklearn import per stage.
+    """
     print(f"\n{'='*60}")
     print(f"🚀 {description}")
     print(f"{'='*60}")
-    
+
     try:
-        result = subprocess.run([sys.executable, script_name], 
-                              capture_output=True, text=True, check=True)
-        print(result.stdout)
-        if result.stderr:
-            print(f"⚠️  Warnings/Info: {result.stderr}")
-        return True
-    except subprocess.CalledProcessError as e:
-        print(f"❌ Error running {script_name}:")
-        print(f"  Exit code: {e.returncode}")
-        print(f"  Error output: {e.stderr}")
-        print(f"  Standard output: {e.stdout}")
+        module = importlib.import_module(module_name)
+    except ImportError as e:
+        print(f"❌ Stage module not found: {module_name} ({e})")
         return False
-    except FileNotFoundError:
-        print(f"❌ Script not found: {script_name}")
+
+    try:
+        module.main()
+        return True
+    except SystemExit as e:
+        if e.code:
+            print(f"❌ Error running {module_name}: exit code {e.code}")
+            return False
+        return True
+    except Exception as e:
+        print(f"❌ Error running {module_name}: {e}")
         return False
 
 def check_prerequisites():
@@ -43,7 +47,8 @@ def check_prerequisites():
     
     missing_files = []
     for file in required_files:
-        if not Path(file).exists():
+        # a Parquet snapshot of the same dataset satisfies the prerequisite
+        if not Path(file).exists() and not Path(file).with_suffix(".parquet").exists():
             missing_files.append(file)
     
     if missing_files:
@@ -112,22 +117,22 @@ def main():
     start_time = time.time()
     
     # Stage 1: Temperature Scaling
-    if not run_script("temp_scale.py", "Stage 1: Global Temperature Scaling"):
+    if not run_stage("temp_scale", "Stage 1: Global Temperature Scaling"):
         print("❌ Temperature scaling failed. Stopping pipeline.")
         return
     
     # Stage 2: EWMA-Weighted Calibration
-    if not run_script("calibrate_ewma_isotonic.py", "Stage 2: EWMA-Weighted Per-Group Calibration"):
+    if not run_stage("calibrate_ewma_isotonic", "Stage 2: EWMA-Weighted Per-Group Calibration"):
         print("❌ EWMA calibration failed. Stopping pipeline.")
         return
     
     # Stage 3: Track-Type Calibration
-    if not run_script("tracktype_calibrate.py", "Stage 3: Track-Type Specific Calibration"):
+    if not run_stage("tracktype_calibrate", "Stage 3: Track-Type Specific Calibration"):
         print("❌ Track-type calibration failed. Stopping pipeline.")
         return
     
     # Stage 4: Comprehensive Evaluation
-    if not run_script("calibration_check.py", "Stage 4: Comprehensive Calibration Evaluation"):
+    if not run_stage("calibration_check", "Stage 4: Comprehensive Calibration Evaluation"):
         print("❌ Calibration evaluation failed.")
         print("⚠️  Pipeline completed but evaluation failed.")
     else:
@@ -149,7 +154,7 @@ def main():
 - calibration_analysis/ (evaluation dashboard)
 
 🔧 Calibration Models:
-- calibration_models/temperature_scaling.joblib
+- calibration_models/temp_scaling_metrics.json (temperature scalar)
 - calibration_models/ewma_calibration/ (driver & team models)
 - calibration_models/tracktype_calibration/ (track-type models)
 
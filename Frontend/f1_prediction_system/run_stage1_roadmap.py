@@ -4,6 +4,7 @@ Stage 1 Roadmap Implementation Runner
 Implements the complete Stage 1: Ranking & Pairwise Learning pipeline
 """
 
+import os
 import pandas as pd
 import numpy as np
 import subprocess
@@ -39,14 +40,15 @@ def check_prerequisites():
     
     required_files = [
         "2025_race_results.csv",
-        "2025_qualifying_results.csv", 
+        "2025_qualifying_results.csv",
         "driver_statistics.csv",
         "driver_track_baselines.csv"
     ]
-    
+
     missing_files = []
     for file in required_files:
-        if not Path(file).exists():
+        # a Parquet snapshot of the same dataset satisfies the prerequisite
+        if not Path(file).exists() and not Path(file).with_suffix(".parquet").exists():
             missing_files.append(file)
     
     if missing_files:
@@ -64,30 +66,24 @@ def run_script(script_name, description):
     
     try:
         start_time = time.time()
-        result = subprocess.run([sys.executable, script_name], 
-                              capture_output=True, text=True, check=True)
-        
+        # Stream output line-by-line instead of buffering the whole child
+        # stdout in memory (capture_output=True); progress shows up live
+        # and peak memory stays flat for chatty scripts.
+        proc = subprocess.Popen([sys.executable, script_name],
+                                stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                bufsize=1, text=True)
+        for line in proc.stdout:
+            print(f"   {line}", end="")
+        returncode = proc.wait()
+
         execution_time = time.time() - start_time
+        if returncode != 0:
+            print(f"❌ {script_name} failed with exit code {returncode}")
+            return False
+
         print(f"✅ {script_name} completed successfully in {execution_time:.1f}s")
-        
-        # Print any important output
-        if result.stdout:
-            lines = result.stdout.strip().split('\n')
-            for line in lines[-5:]:  # Last 5 lines
-                if line.strip():
-                    print(f"   {line}")
-        
         return True
-        
-    except subprocess.CalledProcessError as e:
-        print(f"❌ {script_name} failed with exit code {e.returncode}")
-        if e.stdout:
-            print("STDOUT:")
-            print(e.stdout)
-        if e.stderr:
-            print("STDERR:")
-            print(e.stderr)
-        return False
+
     except Exception as e:
         print(f"❌ Unexpected error running {script_name}: {e}")
         return False
@@ -148,12 +144,20 @@ def validate_stage1_outputs():
         "plackett_luce_models/backtest_results.csv"
     ]
     
+    # One scandir per output directory gives names and sizes together,
+    # instead of an exists() + stat() syscall pair per expected file
+    found = {}
+    for directory in {str(Path(output).parent) for output in expected_outputs}:
+        if os.path.isdir(directory):
+            for entry in os.scandir(directory):
+                found[str(Path(directory) / entry.name)] = entry.stat().st_size
+
     validation_results = {}
     all_valid = True
-    
+
     for output in expected_outputs:
-        if Path(output).exists():
-            file_size = Path(output).stat().st_size
+        file_size = found.get(str(Path(output)))
+        if file_size is not None:
             validation_results[output] = {
                 "status": "✅ exists",
                 "size_bytes": file_size,
@@ -5,23 +5,36 @@ Saves compact calibrated results and cleans up bulky raw files
 Prevents project bloat while preserving essential data
 """
 
+import fnmatch
+import os
 import pandas as pd
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import shutil
 import json
 from datetime import datetime
 import argparse
 
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional: typed columnar output for compact results
+    pq = None
+
 # Configuration
 DEFAULT_MAX_RACES = 5
 DEFAULT_ARCHIVE_OLD = False
 
 class SmartCleanup:
-    def __init__(self, max_races=DEFAULT_MAX_RACES, archive_old=DEFAULT_ARCHIVE_OLD):
+    def __init__(self, max_races=DEFAULT_MAX_RACES, archive_old=DEFAULT_ARCHIVE_OLD,
+                 legacy_csv=False):
         """Initialize cleanup with configuration"""
         self.max_races = max_races
         self.archive_old = archive_old
+        # Parquet is the default compact format; --legacy-csv (or a
+        # missing pyarrow) keeps the old CSV output
+        self.use_parquet = pq is not None and not legacy_csv
         
         # Paths
         self.raw_file = Path("calibrated_results_raw.csv")
@@ -34,145 +47,229 @@ class SmartCleanup:
         if self.archive_old:
             self.archive_dir.mkdir(parents=True, exist_ok=True)
     
-    def load_raw_results(self):
-        """Load raw calibrated results"""
+    def create_compact_results(self):
+        """Stream the raw results into a compact per-race CSV
+
+        The raw file can be huge, so only the essential columns are parsed
+        (picked from a header-only sniff) and rows flow through in chunks —
+        peak memory stays at one chunk instead of the whole file plus its
+        compacted copy.
+        """
         if not self.raw_file.exists():
             print(f"❌ Raw results file not found: {self.raw_file}")
             return None
-        
-        try:
-            results = pd.read_csv(self.raw_file)
-            print(f"✅ Loaded raw results: {len(results)} records")
-            return results
-        except Exception as e:
-            print(f"❌ Error loading raw results: {e}")
-            return None
-    
-    def create_compact_results(self, results):
-        """Create compact version with only essential fields"""
+
         print("📦 Creating compact results...")
-        
-        # Identify essential columns
+
+        # Identify essential columns from the header alone
+        header = pd.read_csv(self.raw_file, nrows=0)
         essential_cols = []
-        for col in results.columns:
+        for col in header.columns:
             if any(keyword in col.lower() for keyword in [
                 'race', 'driver', 'team', 'win_prob', 'podium_prob', 'points_prob'
             ]):
                 essential_cols.append(col)
-        
+
         # If no essential columns found, use basic ones
         if not essential_cols:
-            essential_cols = ['race', 'driver', 'team', 'win_prob']
-        
-        # Create compact dataframe
-        compact = results[essential_cols].copy()
-        
-        # Clean up any NaN values
-        compact = compact.fillna(0)
-        
+            essential_cols = [c for c in ['race', 'driver', 'team', 'win_prob']
+                              if c in header.columns]
+        if not essential_cols:
+            print("❌ No usable columns found in raw results")
+            return None
+
+        suffix = ".parquet" if self.use_parquet else ".csv"
+        try:
+            out_file = None
+            writer = None
+            total_rows = 0
+            reader = pd.read_csv(self.raw_file, usecols=essential_cols,
+                                 chunksize=200_000)
+            for chunk in reader:
+                # Zero the NaNs column-wise: only columns that actually
+                # contain NaN get rewritten, instead of fillna copying
+                # every column of the chunk
+                for col in chunk.columns:
+                    values = chunk[col].to_numpy()
+                    if values.dtype.kind == 'f' and np.isnan(values).any():
+                        chunk[col] = np.nan_to_num(values, nan=0.0)
+                    elif values.dtype.kind == 'O' and chunk[col].isna().any():
+                        chunk[col] = chunk[col].fillna(0)
+                if out_file is None:
+                    # Race id (for the filename) comes from the first chunk
+                    race_col = next(
+                        (c for c in essential_cols if 'race' in c.lower()), None)
+                    race_id = chunk[race_col].iloc[0] if race_col else "unknown_race"
+                    timestamp = self.run_ts.strftime("%Y%m%d_%H%M%S")
+                    out_file = self.out_dir / f"results_{race_id}_{timestamp}{suffix}"
+                if self.use_parquet:
+                    # Typed columnar chunks, snappy-compressed; the string
+                    # columns get dictionary-encoded by the writer
+                    table = pa.Table.from_pandas(chunk, preserve_index=False)
+                    if writer is None:
+                        writer = pq.ParquetWriter(out_file, table.schema,
+                                                  compression='snappy')
+                    else:
+                        table = table.cast(writer.schema)
+                    writer.write_table(table)
+                else:
+                    chunk.to_csv(out_file, mode='a' if total_rows else 'w',
+                                 header=total_rows == 0, index=False)
+                total_rows += len(chunk)
+        except Exception as e:
+            print(f"❌ Error compacting raw results: {e}")
+            return None
+        finally:
+            if writer is not None:
+                writer.close()
+
+        if out_file is None:
+            print("❌ Raw results file is empty")
+            return None
+
         print(f"  Kept {len(essential_cols)} essential columns")
-        print(f"  Compact shape: {compact.shape}")
-        
-        return compact
-    
-    def save_compact_results(self, compact, race_id):
-        """Save compact results for a specific race"""
-        # Generate filename with timestamp
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"results_{race_id}_{timestamp}.csv"
-        out_file = self.out_dir / filename
-        
-        # Save compact results
-        compact.to_csv(out_file, index=False)
+        print(f"  Compact shape: ({total_rows}, {len(essential_cols)})")
         print(f"✅ Saved compact results: {out_file}")
-        
-        # Also save a "latest" version
-        latest_file = self.out_dir / f"latest_{race_id}.csv"
-        compact.to_csv(latest_file, index=False)
+
+        # Also expose a "latest" alias: a hardlink shares the blocks with
+        # the timestamped file, so the alias costs no write bandwidth at
+        # all; fall back to a byte copy on filesystems without hardlinks
+        latest_file = self.out_dir / f"latest_{race_id}{suffix}"
+        latest_file.unlink(missing_ok=True)
+        try:
+            os.link(out_file, latest_file)
+        except OSError:
+            shutil.copyfile(out_file, latest_file)
         print(f"✅ Saved latest results: {latest_file}")
-        
+
         return out_file
     
+    def _delete_tree(self, root):
+        """Delete a directory tree with parallel unlinks
+
+        unlink releases the GIL, so a small thread pool overlaps the
+        kernel-side filesystem work instead of shutil.rmtree's strictly
+        serial walk. Returns the number of bytes freed.
+        """
+        files = []
+        dirs = []
+        stack = [str(root)]
+        while stack:
+            directory = stack.pop()
+            dirs.append(directory)
+            with os.scandir(directory) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    else:
+                        files.append((entry.path, entry.stat().st_size))
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(os.unlink, (path for path, _ in files)))
+
+        # Children sort after their parents by path length, so reversing
+        # removes the now-empty directories bottom-up
+        for directory in sorted(dirs, key=len, reverse=True):
+            os.rmdir(directory)
+
+        return sum(size for _, size in files)
+
     def cleanup_raw_files(self):
         """Delete bulky raw files to prevent project bloat"""
         print("🧹 Cleaning up raw files...")
         
         deleted_files = []
-        
-        # Delete raw calibrated results file
+        bytes_deleted = 0
+
+        # Delete raw calibrated results file (size recorded before unlink —
+        # it can't be stat'ed for the summary afterwards)
         if self.raw_file.exists():
+            bytes_deleted += self.raw_file.stat().st_size
             self.raw_file.unlink()
             deleted_files.append(str(self.raw_file))
             print(f"  Deleted: {self.raw_file}")
-        
+
         # Delete raw dumps directory
         if self.raw_dir.exists():
-            shutil.rmtree(self.raw_dir)
+            bytes_deleted += self._delete_tree(self.raw_dir)
             deleted_files.append(str(self.raw_dir))
             print(f"  Deleted: {self.raw_dir}")
-        
-        # Delete other potential bulky files
+
+        # Delete other potential bulky files: one scandir pass checks every
+        # pattern per entry instead of five glob walks over the directory,
+        # and DirEntry reuses the readdir metadata for is_file/stat
         bulky_patterns = [
             "monte_carlo_*.csv",
-            "calibration_*.csv", 
+            "calibration_*.csv",
             "raw_*.csv",
             "temp_*.csv",
             "debug_*.csv"
         ]
-        
-        for pattern in bulky_patterns:
-            for file_path in Path(".").glob(pattern):
-                if file_path.is_file() and file_path.stat().st_size > 1024 * 1024:  # > 1MB
-                    file_path.unlink()
-                    deleted_files.append(str(file_path))
-                    print(f"  Deleted bulky file: {file_path}")
-        
+
+        with os.scandir(".") as it:
+            for entry in it:
+                if not any(fnmatch.fnmatchcase(entry.name, pattern)
+                           for pattern in bulky_patterns):
+                    continue
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+                size = entry.stat().st_size
+                if size > 1024 * 1024:  # > 1MB
+                    os.unlink(entry.path)
+                    deleted_files.append(entry.name)
+                    bytes_deleted += size
+                    print(f"  Deleted bulky file: {entry.name}")
+
         print(f"  Total files deleted: {len(deleted_files)}")
-        return deleted_files
+        return deleted_files, bytes_deleted
     
     def manage_race_history(self):
         """Keep only the last N races, optionally archive old ones"""
         print(f"📚 Managing race history (keeping last {self.max_races} races)...")
         
-        # Find all result files
-        result_files = list(self.out_dir.glob("results_*.csv"))
-        
-        if len(result_files) <= self.max_races:
-            print(f"  Only {len(result_files)} races found, no cleanup needed")
+        # Find all result files (CSV or Parquet), stat'ing each exactly
+        # once for the sort
+        entries = [(p, p.stat()) for p in self.out_dir.glob("results_*")
+                   if p.suffix in ('.csv', '.parquet')]
+
+        if len(entries) <= self.max_races:
+            print(f"  Only {len(entries)} races found, no cleanup needed")
             return
-        
-        # Sort by modification time (newest first)
-        result_files.sort(key=lambda f: f.stat().st_mtime, reverse=True)
-        
+
+        # Sort by cached modification time (newest first)
+        entries.sort(key=lambda e: e[1].st_mtime, reverse=True)
+
         # Files to keep vs. remove
-        files_to_keep = result_files[:self.max_races]
-        files_to_remove = result_files[self.max_races:]
+        files_to_keep = [p for p, _ in entries[:self.max_races]]
+        files_to_remove = [p for p, _ in entries[self.max_races:]]
         
         print(f"  Keeping: {len(files_to_keep)} races")
         print(f"  Removing: {len(files_to_remove)} races")
         
-        for file_path in files_to_remove:
-            if self.archive_old:
-                # Archive old file
+        if self.archive_old:
+            for file_path in files_to_remove:
                 archive_path = self.archive_dir / file_path.name
                 shutil.move(str(file_path), str(archive_path))
                 print(f"  Archived: {file_path} → {archive_path}")
-            else:
-                # Delete old file
-                file_path.unlink()
+        else:
+            # Batch the unlinks through a thread pool — they overlap in
+            # the kernel since unlink drops the GIL
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                list(executor.map(os.unlink, map(str, files_to_remove)))
+            for file_path in files_to_remove:
                 print(f"  Deleted: {file_path}")
     
-    def create_cleanup_summary(self, compact_file, deleted_files):
+    def create_cleanup_summary(self, compact_file, deleted_files, bytes_deleted):
         """Create a summary of the cleanup operation"""
         summary = {
-            "cleanup_date": datetime.now().isoformat(),
+            "cleanup_date": self.run_ts.isoformat(),
             "max_races_kept": self.max_races,
             "archive_old": self.archive_old,
             "compact_file": str(compact_file),
             "deleted_files": deleted_files,
-            "total_space_saved_mb": sum(
-                Path(f).stat().st_size for f in deleted_files if Path(f).exists()
-            ) / (1024 * 1024) if deleted_files else 0
+            # sizes were captured at delete time — re-stat'ing the paths
+            # here would find nothing (they're gone)
+            "total_space_saved_mb": bytes_deleted / (1024 * 1024)
         }
         
         # Save summary
@@ -187,33 +284,24 @@ class SmartCleanup:
         """Run the complete cleanup pipeline"""
         print("🚀 Starting Smart Cleanup Pipeline")
         print("=" * 50)
-        
-        # Load raw results
-        results = self.load_raw_results()
-        if results is None:
+
+        # One timestamp per run: the compact filename and the summary
+        # record the same instant, so outputs correlate across files
+        self.run_ts = datetime.now()
+
+        # Stream raw results into the compact per-race file
+        compact_file = self.create_compact_results()
+        if compact_file is None:
             return False
         
-        # Create compact results
-        compact = self.create_compact_results(results)
-        
-        # Extract race ID
-        race_col = next((col for col in compact.columns if 'race' in col.lower()), 'race')
-        if race_col in compact.columns:
-            race_id = compact[race_col].iloc[0]
-        else:
-            race_id = "unknown_race"
-        
-        # Save compact results
-        compact_file = self.save_compact_results(compact, race_id)
-        
         # Cleanup raw files
-        deleted_files = self.cleanup_raw_files()
-        
+        deleted_files, bytes_deleted = self.cleanup_raw_files()
+
         # Manage race history
         self.manage_race_history()
-        
+
         # Create summary
-        summary = self.create_cleanup_summary(compact_file, deleted_files)
+        summary = self.create_cleanup_summary(compact_file, deleted_files, bytes_deleted)
         
         print("\n🎉 Smart Cleanup Completed Successfully!")
         print(f"📁 Compact results saved to: {self.out_dir}")
@@ -232,13 +320,16 @@ def main():
                        help=f"Maximum number of races to keep (default: {DEFAULT_MAX_RACES})")
     parser.add_argument("--archive", action="store_true", default=DEFAULT_ARCHIVE_OLD,
                        help="Archive old races instead of deleting them")
-    
+    parser.add_argument("--legacy-csv", action="store_true",
+                       help="Write compact results as CSV instead of Parquet")
+
     args = parser.parse_args()
-    
+
     # Run cleanup
     cleanup = SmartCleanup(
         max_races=args.max_races,
-        archive_old=args.archive
+        archive_old=args.archive,
+        legacy_csv=args.legacy_csv
     )
     
     success = cleanup.run_cleanup()
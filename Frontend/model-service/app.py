@@ -2,12 +2,23 @@ from flask import Flask, request, jsonify
 from flask_cors import CORS
 import os
 import json
-import pandas as pd
 import numpy as np
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
-import joblib
 import logging
+import threading
+import time
+
+# pandas and joblib are imported lazily inside the functions that need
+# them — together they dominate module import time, which is pure
+# cold-start latency for an autoscaled container. After the first use
+# the function-scope import is a sys.modules lookup.
+
+try:
+    import orjson
+except ImportError:  # optional: fast JSON serialization for large payloads
+    orjson = None
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -20,11 +31,26 @@ CORS(app)
 app.config['CORS_HEADERS'] = 'Content-Type'
 app.config['JSONIFY_PRETTYPRINT_REGULAR'] = False
 
+def fast_jsonify(data):
+    """jsonify for numeric-heavy payloads, serialized with orjson
+
+    orjson is a compiled encoder (and handles numpy scalars natively);
+    falls back to Flask's jsonify when it isn't installed.
+    """
+    if orjson is None:
+        return jsonify(data)
+    return app.response_class(orjson.dumps(data), mimetype='application/json')
+
 # Global variables for ML model and data
 ml_model = None
 scaler = None
 feature_columns = None
+feature_plan = None
+driver_id = {}
+driver_stats_arr = None
+_feature_template_cache = {}
 driver_stats = None
+driver_stats_dict = {}
 track_features = None
 
 # Track characteristics and dominance factors
@@ -138,10 +164,81 @@ DRIVER_TRACK_DOMINANCE = {
     }
 }
 
+# 2025 grid driver → team mapping, one O(1) lookup per driver
+DRIVER_TEAM = {
+    "Lando Norris": "McLaren",
+    "Oscar Piastri": "McLaren",
+    "Max Verstappen": "Red Bull Racing",
+    "George Russell": "Mercedes",
+    "Lewis Hamilton": "Mercedes",
+    "Charles Leclerc": "Ferrari",
+    "Carlos Sainz": "Ferrari",
+    "Fernando Alonso": "Aston Martin",
+    "Lance Stroll": "Aston Martin",
+    "Pierre Gasly": "Alpine",
+    "Esteban Ocon": "Alpine",
+    "Nico Hulkenberg": "Haas",
+    "Kevin Magnussen": "Haas",
+    "Yuki Tsunoda": "RB",
+    "Daniel Ricciardo": "RB",
+    "Alexander Albon": "Williams",
+    "Valtteri Bottas": "Kick Sauber",
+    "Zhou Guanyu": "Kick Sauber",
+}
+
+# Shared miss default for the dominance lookups — reusing one frozen
+# empty dict avoids allocating a fresh {} per .get miss in the loop
+_EMPTY = {}
+
+def _build_feature_plan():
+    """Resolve each feature column to its fill source ahead of time
+
+    Maps the feature list onto (index, name) pairs served by the driver
+    statistics plus the indices of the special computed features, so the
+    per-request feature build assigns into known column indices instead
+    of string-comparing every feature name again.
+    """
+    import pandas as pd
+    global feature_plan, driver_id, driver_stats_arr
+
+    if not feature_columns:
+        feature_plan = None
+        driver_id = {}
+        driver_stats_arr = None
+        return
+
+    stat_cols = set(driver_stats.columns) if isinstance(driver_stats, pd.DataFrame) else set()
+    stat_features = [(j, f) for j, f in enumerate(feature_columns)
+                     if f in stat_cols and f != 'driver']
+    covered = {f for _, f in stat_features}
+    special_idx = {name: feature_columns.index(name)
+                   for name in ('weather_impact', 'track_advantage', 'recent_form_score')
+                   if name in feature_columns and name not in covered}
+    feature_plan = (stat_features, special_idx)
+
+    # Contiguous float32 stats matrix, one row per driver: the batch
+    # feature build gathers whole rows by integer id instead of going
+    # through a pandas reindex. NaN cells take the 0.5 default here so
+    # the gather needs no per-request fixups.
+    driver_id = {}
+    driver_stats_arr = None
+    if stat_features and not driver_stats.empty and 'driver' in driver_stats.columns:
+        names = driver_stats['driver'].astype(str).tolist()
+        driver_id = {name: i for i, name in enumerate(names)}
+        driver_stats_arr = np.empty((len(names), len(stat_features)), dtype=np.float32)
+        for k, (_, feature) in enumerate(stat_features):
+            driver_stats_arr[:, k] = pd.to_numeric(
+                driver_stats[feature], errors='coerce').fillna(0.5).to_numpy(np.float32)
+
+    # Cached feature templates were built against the previous plan
+    _feature_template_cache.clear()
+
 def load_ml_model():
     """Load the trained XGBoost model and scaler"""
+    import joblib
+    import pandas as pd
     global ml_model, scaler, feature_columns
-    
+
     try:
         # Path to the ML model files
         model_path = Path(__file__).parent.parent / 'f1_prediction_system' / 'f1_prediction_model.joblib'
@@ -172,20 +269,39 @@ def load_ml_model():
         scaler = None
         feature_columns = []
 
+    _build_feature_plan()
+
 def load_driver_data():
     """Load driver statistics and track baselines"""
-    global driver_stats, track_features
-    
+    import pandas as pd
+    global driver_stats, driver_stats_dict, track_features
+
     try:
         # Load driver statistics
         stats_path = Path(__file__).parent.parent / 'f1_prediction_system' / 'driver_statistics.csv'
         if stats_path.exists():
             driver_stats = pd.read_csv(stats_path)
+            if 'driver' in driver_stats.columns:
+                # Categorical key column: repeated names share one string
+                # object and any remaining pandas filtering on it compares
+                # integer codes instead of strings
+                driver_stats['driver'] = driver_stats['driver'].astype('category')
             logger.info("✅ Driver statistics loaded")
         else:
             driver_stats = pd.DataFrame()
             logger.warning("⚠️ Driver statistics not found")
-            
+
+        # Per-driver rows as plain dicts: the hot lookups become one
+        # dict.get instead of a boolean-mask scan over the DataFrame
+        if not driver_stats.empty and 'driver' in driver_stats.columns:
+            driver_stats_dict = driver_stats.set_index('driver').to_dict('index')
+        else:
+            driver_stats_dict = {}
+
+        # Memoized per-driver scores are stale once the stats change
+        calculate_driver_season_form.cache_clear()
+        calculate_track_dominance_score.cache_clear()
+
         # Load track features
         track_path = Path(__file__).parent.parent / 'f1_prediction_system' / 'data' / 'raw' / 'track_features.csv'
         if track_path.exists():
@@ -198,41 +314,51 @@ def load_driver_data():
     except Exception as e:
         logger.error(f"❌ Error loading driver data: {e}")
         driver_stats = pd.DataFrame()
+        driver_stats_dict = {}
         track_features = pd.DataFrame()
 
+    # The stat-served feature indices depend on the loaded columns
+    _build_feature_plan()
+
+@lru_cache(maxsize=None)
 def calculate_driver_season_form(driver_name: str) -> float:
-    """Calculate driver's 2025 season form based on recent performance"""
+    """Calculate driver's 2025 season form based on recent performance
+
+    Memoized — the result only changes when the stats reload, and
+    load_driver_data clears the cache when that happens.
+    """
+    import pandas as pd
     try:
-        if driver_stats.empty:
+        # O(1) lookup into the dict built by load_driver_data — no
+        # boolean-mask filter of the stats DataFrame per call
+        row = driver_stats_dict.get(driver_name)
+        if row is None:
             return 0.5
-            
-        driver_data = driver_stats[driver_stats['driver'] == driver_name]
-        if driver_data.empty:
-            return 0.5
-            
+
         # Get recent form score if available
-        if 'recent_form_score' in driver_data.columns:
-            form_score = driver_data['recent_form_score'].iloc[0]
+        form_score = row.get('recent_form_score')
+        if form_score is not None and not pd.isna(form_score):
             return max(0.1, min(1.0, form_score))
-            
+
         # Fallback calculation
-        if 'total_points' in driver_data.columns:
-            points = driver_data['total_points'].iloc[0]
-            position = driver_data.get('position', [20]).iloc[0]
-            
+        points = row.get('total_points')
+        if points is not None and not pd.isna(points):
+            position = row.get('position', 20)
+
             # Calculate form score (0-1)
             max_points = 100  # Approximate max points after few races
             position_penalty = (position - 1) * 0.05
-            
+
             form_score = min(1.0, max(0.1, (points / max_points) - position_penalty))
             return form_score
-        
+
         return 0.5
-        
+
     except Exception as e:
         logger.warning(f"Error calculating season form for {driver_name}: {e}")
         return 0.5
 
+@lru_cache(maxsize=None)
 def calculate_track_dominance_score(driver_name: str, race_name: str) -> float:
     """Calculate driver's dominance score for a specific track"""
     try:
@@ -243,109 +369,161 @@ def calculate_track_dominance_score(driver_name: str, race_name: str) -> float:
         logger.warning(f"Error calculating track dominance for {driver_name} at {race_name}: {e}")
         return 0.5
 
-def apply_weather_adjustments(base_prob: float, weather: dict, track_type: str) -> float:
-    """Apply weather-based adjustments to driver probabilities"""
+def compute_weather_multiplier(weather: dict, track_type: str) -> float:
+    """Weather adjustment multiplier shared by every driver at a race
+
+    All drivers face the same conditions, so the temp/rain/wind/track
+    branches are evaluated once per race and callers broadcast the
+    resulting scalar over their probabilities.
+    """
     try:
         adjustment = 1.0
-        
+
         # Temperature effects
         temp_c = weather.get('tempC', 24)
         if temp_c > 30:
             adjustment *= 0.95  # Hot weather slightly reduces performance
         elif temp_c < 10:
             adjustment *= 0.97  # Cold weather slightly reduces performance
-            
+
         # Rain effects
         rain_chance = weather.get('rainChancePct', 18)
         if rain_chance > 50:
             adjustment *= 0.90  # Heavy rain significantly reduces performance
         elif rain_chance > 20:
             adjustment *= 0.95  # Light rain slightly reduces performance
-            
+
         # Wind effects
         wind_kmh = weather.get('windKmh', 21)
         if wind_kmh > 30:
             adjustment *= 0.93  # High winds reduce performance
         elif wind_kmh > 20:
             adjustment *= 0.97  # Moderate winds slightly reduce performance
-            
+
         # Track type specific adjustments
         if track_type == "street_circuit" and rain_chance > 30:
             adjustment *= 0.92  # Street circuits are more sensitive to rain
-            
-        return max(0.1, min(1.0, base_prob * adjustment))
-        
+
+        return adjustment
+
     except Exception as e:
         logger.warning(f"Error applying weather adjustments: {e}")
-        return base_prob
+        return 1.0
+
+def generate_ml_features_batch(drivers: list, race_name: str, weather: dict, track_info: dict) -> np.ndarray:
+    """Generate the ML feature matrix for all drivers at once
 
-def generate_ml_features(driver_name: str, race_name: str, weather: dict, track_info: dict) -> np.ndarray:
-    """Generate ML features for the trained model"""
+    One (n_drivers, n_features) array replaces the per-driver feature
+    vectors: the driver statistics land in their rows through one
+    integer-id gather from the precomputed stats matrix and the weather
+    impact is computed once — it is the same score for every driver.
+    """
     try:
         if not feature_columns or ml_model is None:
             return None
-            
-        # Initialize feature vector with zeros
-        features = np.zeros(len(feature_columns))
-        
-        # Get driver statistics
-        driver_data = driver_stats[driver_stats['driver'] == driver_name] if not driver_stats.empty else pd.DataFrame()
-        
-        # Fill in available features
-        for i, feature in enumerate(feature_columns):
-            if feature in driver_data.columns and not driver_data.empty:
-                features[i] = driver_data[feature].iloc[0]
-            elif feature == 'weather_impact':
-                # Calculate weather impact score
-                weather_score = 1.0
-                if weather.get('rainChancePct', 0) > 30:
-                    weather_score *= 0.8
-                if weather.get('windKmh', 0) > 25:
-                    weather_score *= 0.9
-                features[i] = weather_score
-            elif feature == 'track_advantage':
-                # Calculate track advantage based on dominance
-                track_dominance = calculate_track_dominance_score(driver_name, race_name)
-                features[i] = track_dominance
-            elif feature == 'recent_form_score':
-                # Use season form
-                features[i] = calculate_driver_season_form(driver_name)
-            else:
-                # Use default values for missing features
-                features[i] = 0.5
-        
-        # Reshape for model input
-        features = features.reshape(1, -1)
-        
-        # Scale features if scaler is available
+
+        if feature_plan is None:
+            _build_feature_plan()
+        stat_features, special_idx = feature_plan
+
+        # Everything except the weather column is fixed for a given grid
+        # and race until the stats reload, so build that part once and
+        # reuse it across requests
+        key = (tuple(drivers), race_name)
+        template = _feature_template_cache.get(key)
+        if template is None:
+            # Default for features with no source data (matches the old
+            # per-driver fallback value)
+            template = np.full((len(drivers), len(feature_columns)), 0.5,
+                               dtype=np.float32)
+
+            if stat_features and driver_stats_arr is not None:
+                # Fancy-index gather: rows for known drivers come straight
+                # out of the contiguous stats matrix; unknown drivers keep
+                # the 0.5 default fill
+                known = [(row, driver_id[d]) for row, d in enumerate(drivers)
+                         if d in driver_id]
+                if known:
+                    rows = np.array([r for r, _ in known])
+                    ids = np.array([i for _, i in known])
+                    cols = np.array([j for j, _ in stat_features])
+                    template[np.ix_(rows, cols)] = driver_stats_arr[ids]
+
+            j = special_idx.get('track_advantage')
+            if j is not None:
+                template[:, j] = [calculate_track_dominance_score(d, race_name)
+                                  for d in drivers]
+
+            j = special_idx.get('recent_form_score')
+            if j is not None:
+                template[:, j] = [calculate_driver_season_form(d)
+                                  for d in drivers]
+
+            if len(_feature_template_cache) >= 32:
+                _feature_template_cache.pop(next(iter(_feature_template_cache)))
+            _feature_template_cache[key] = template
+
+        features = template.copy()
+
+        j = special_idx.get('weather_impact')
+        if j is not None:
+            # Weather impact is race-wide, not per driver
+            weather_score = 1.0
+            if weather.get('rainChancePct', 0) > 30:
+                weather_score *= 0.8
+            if weather.get('windKmh', 0) > 25:
+                weather_score *= 0.9
+            features[:, j] = weather_score
+
+        # Scale features if scaler is available; keep the matrix float32 —
+        # XGBoost converts to float32 internally anyway, so a float64
+        # round-trip is wasted bandwidth
         if scaler is not None:
-            features = scaler.transform(features)
-            
+            features = scaler.transform(features).astype(np.float32, copy=False)
+
         return features
-        
+
     except Exception as e:
         logger.error(f"Error generating ML features: {e}")
         return None
 
-def predict_with_ml_model(driver_name: str, race_name: str, weather: dict, track_info: dict) -> tuple:
-    """Use the trained ML model to predict win probability"""
+def predict_with_ml_model_batch(drivers: list, race_name: str, weather: dict, track_info: dict) -> tuple:
+    """Predict win probabilities for the whole grid in one model call
+
+    A single predict_proba on the stacked feature matrix replaces twenty
+    one-row calls, which were dominated by per-call dispatch overhead
+    rather than actual inference.
+    """
     try:
         if ml_model is None:
             return None, None
-            
-        # Generate features
-        features = generate_ml_features(driver_name, race_name, weather, track_info)
+
+        features = generate_ml_features_batch(drivers, race_name, weather, track_info)
         if features is None:
             return None, None
-            
-        # Make prediction
-        win_prob = ml_model.predict_proba(features)[0, 1]  # Probability of winning
-        
-        # Apply weather adjustments
-        adjusted_prob = apply_weather_adjustments(win_prob, weather, track_info.get('type', 'permanent_circuit'))
-        
-        return adjusted_prob, win_prob
-        
+
+        # Probability of winning, one row per driver. For an XGBoost
+        # classifier go straight to the booster — binary:logistic predict
+        # returns the positive-class probabilities and skips the sklearn
+        # wrapper's per-call input validation
+        win_probs = None
+        if hasattr(ml_model, 'get_booster'):
+            try:
+                import xgboost as xgb
+                win_probs = ml_model.get_booster().predict(
+                    xgb.DMatrix(features, nthread=1))
+            except Exception:
+                win_probs = None
+        if win_probs is None:
+            win_probs = ml_model.predict_proba(features)[:, 1]
+
+        # Weather adjustment is one race-wide scalar, broadcast over the grid
+        track_type = track_info.get('type', 'permanent_circuit')
+        multiplier = compute_weather_multiplier(weather, track_type)
+        adjusted = np.clip(win_probs * multiplier, 0.1, 1.0)
+
+        return adjusted, win_probs
+
     except Exception as e:
         logger.error(f"Error predicting with ML model: {e}")
         return None, None
@@ -372,11 +550,18 @@ def generate_dynamic_predictions(race_name: str, race_date: str, weather: dict)
         ]
         
         predictions = []
-        
+
+        # Race-wide constants, bound once instead of re-derived per driver
+        track_type = track_info.get('type', 'permanent_circuit')
+        weather_multiplier = compute_weather_multiplier(weather, track_type)
+
+        # One batched model call for the whole grid
+        ml_probs, base_ml_probs = predict_with_ml_model_batch(
+            base_drivers, race_name, weather, track_info)
+
         for i, driver_name in enumerate(base_drivers):
-            # Try ML model prediction first
-            ml_win_prob, base_ml_prob = predict_with_ml_model(driver_name, race_name, weather, track_info)
-            
+            ml_win_prob = ml_probs[i] if ml_probs is not None else None
+
             if ml_win_prob is not None:
                 # Use ML model prediction
                 win_prob_pct = ml_win_prob * 100
@@ -391,7 +576,7 @@ def generate_dynamic_predictions(race_name: str, race_date: str, weather: dict)
                 base_prob = (season_form * 0.4 + track_dominance * 0.4 + team_performance * 0.2)
                 
                 # Apply weather adjustments
-                adjusted_prob = apply_weather_adjustments(base_prob, weather, track_info["type"])
+                adjusted_prob = max(0.1, min(1.0, base_prob * weather_multiplier))
                 win_prob_pct = adjusted_prob * 100
                 logger.info(f"Rule-based prediction for {driver_name}: {win_prob_pct:.2f}%")
             
@@ -399,24 +584,15 @@ def generate_dynamic_predictions(race_name: str, race_date: str, weather: dict)
             podium_prob_pct = min(100, win_prob_pct * 2.5)
             
             # Get team name
-            team = "McLaren" if driver_name in ["Lando Norris", "Oscar Piastri"] else \
-                   "Red Bull Racing" if driver_name == "Max Verstappen" else \
-                   "Mercedes" if driver_name in ["George Russell", "Lewis Hamilton"] else \
-                   "Ferrari" if driver_name in ["Charles Leclerc", "Carlos Sainz"] else \
-                   "Aston Martin" if driver_name in ["Fernando Alonso", "Lance Stroll"] else \
-                   "Alpine" if driver_name in ["Pierre Gasly", "Esteban Ocon"] else \
-                   "Haas" if driver_name in ["Nico Hulkenberg", "Kevin Magnussen"] else \
-                   "RB" if driver_name in ["Yuki Tsunoda", "Daniel Ricciardo"] else \
-                   "Williams" if driver_name == "Alexander Albon" else \
-                   "Kick Sauber" if driver_name in ["Valtteri Bottas", "Zhou Guanyu"] else \
-                   "—"
+            team = DRIVER_TEAM.get(driver_name, "—")
             
-            # Track history
+            # Track history — resolve the driver/race record once, not per field
+            history = DRIVER_TRACK_DOMINANCE.get(driver_name, _EMPTY).get(race_name, _EMPTY)
             track_history = {
-                "wins": DRIVER_TRACK_DOMINANCE.get(driver_name, {}).get(race_name, {}).get("wins", 0),
-                "poles": DRIVER_TRACK_DOMINANCE.get(driver_name, {}).get(race_name, {}).get("poles", 0),
-                "podiums": DRIVER_TRACK_DOMINANCE.get(driver_name, {}).get(race_name, {}).get("podiums", 0),
-                "avg_position": DRIVER_TRACK_DOMINANCE.get(driver_name, {}).get(race_name, {}).get("avg_position", 10.0)
+                "wins": history.get("wins", 0),
+                "poles": history.get("poles", 0),
+                "podiums": history.get("podiums", 0),
+                "avg_position": history.get("avg_position", 10.0)
             }
             
             prediction = {
@@ -433,36 +609,50 @@ def generate_dynamic_predictions(race_name: str, race_date: str, weather: dict)
             
             predictions.append(prediction)
         
-        # Sort by win probability and reassign positions
-        predictions.sort(key=lambda x: x['winProbPct'], reverse=True)
-        for i, pred in enumerate(predictions):
-            pred['position'] = i + 1
-        
-        # Normalize probabilities to sum to ~100%
-        total_prob = sum(p['winProbPct'] for p in predictions)
+        # Rank and normalize in one numpy pass: stable argsort orders the
+        # grid by win probability, the sum normalizes to ~100%, and a
+        # single final loop writes positions and normalized values back
+        probs = np.array([p['winProbPct'] for p in predictions], dtype=np.float64)
+        order = np.argsort(-probs, kind='stable')
+        total_prob = probs.sum()
         if total_prob > 0:
-            for pred in predictions:
-                pred['winProbPct'] = round((pred['winProbPct'] / total_prob) * 100, 2)
-        
+            probs = probs / total_prob * 100.0
+
+        predictions = [predictions[j] for j in order]
+        for rank, j in enumerate(order):
+            pred = predictions[rank]
+            pred['position'] = rank + 1
+            if total_prob > 0:
+                pred['winProbPct'] = round(float(probs[j]), 2)
+
         return predictions
         
     except Exception as e:
         logger.error(f"Error generating dynamic predictions: {e}")
         return []
 
+# Canned bodies for the high-frequency polling endpoints: /health never
+# changes, and /live/status only varies in its timestamp, so the fixed
+# JSON is serialized once at import and the timestamp spliced in as bytes
+if orjson is not None:
+    _HEALTH_BODY = orjson.dumps({'status': 'healthy', 'service': 'ml-service'})
+else:
+    _HEALTH_BODY = json.dumps({'status': 'healthy', 'service': 'ml-service'}).encode()
+_LIVE_STATUS_PREFIX = (b'{"status":"pre_race","current_session":null,'
+                       b'"connected_clients":0,"last_update":"')
+_LIVE_STATUS_SUFFIX = b'"}'
+
 @app.route('/live/status', methods=['GET'])
 def live_status():
-    return jsonify({
-        'status': 'pre_race',
-        'current_session': None,
-        'last_update': datetime.utcnow().isoformat() + 'Z',
-        'connected_clients': 0
-    })
+    timestamp = datetime.utcnow().isoformat() + 'Z'
+    return app.response_class(
+        _LIVE_STATUS_PREFIX + timestamp.encode() + _LIVE_STATUS_SUFFIX,
+        mimetype='application/json')
 
 @app.route('/live/race/<int:year>/<int:round>', methods=['GET'])
 def live_race(year: int, round: int):
     # Minimal stub so frontend stops polling errors
-    return jsonify({
+    return fast_jsonify({
         'positions': [],
         'lap_number': 0,
         'total_laps': 0,
@@ -474,7 +664,7 @@ def live_race(year: int, round: int):
 
 @app.route('/health', methods=['GET'])
 def health_check():
-    return jsonify({'status': 'healthy', 'service': 'ml-service'})
+    return app.response_class(_HEALTH_BODY, mimetype='application/json')
 
 @app.route('/predict', methods=['POST'])
 def predict():
@@ -502,14 +692,15 @@ def betting_markets():
         'Charles Leclerc','Carlos Sainz','Fernando Alonso','Lance Stroll','Pierre Gasly',
         'Esteban Ocon','Nico Hulkenberg','Kevin Magnussen','Yuki Tsunoda','Daniel Ricciardo',
         'Alexander Albon','Valtteri Bottas','Zhou Guanyu','Andrea Kimi Antonelli','Oliver Bearman']
-    base = 0.18
-    markets = []
-    for i, d in enumerate(drivers):
-        prob = max(0.005, base - i * 0.006)
-        odds = max(1.01, round(1.0 / prob, 2))
-        markets.append({'driver': d, 'prob': round(prob, 4), 'odds': odds})
-    margin = max(0.05, sum(m['prob'] for m in markets) - 1.0)
-    return jsonify({'race': name, 'date': date, 'margin': round(margin * 100, 2), 'markets': markets})
+    # Whole-grid arrays instead of scalar max/round per driver
+    idx = np.arange(len(drivers), dtype=np.float64)
+    probs = np.clip(0.18 - idx * 0.006, 0.005, None)
+    odds = np.maximum(1.01, np.round(1.0 / probs, 2))
+    probs = np.round(probs, 4)
+    markets = [{'driver': d, 'prob': float(p), 'odds': float(o)}
+               for d, p, o in zip(drivers, probs, odds)]
+    margin = max(0.05, float(probs.sum()) - 1.0)
+    return fast_jsonify({'race': name, 'date': date, 'margin': round(margin * 100, 2), 'markets': markets})
 
 @app.route('/betting/place', methods=['POST'])
 def betting_place():
@@ -560,6 +751,38 @@ def _final_predictions_dir() -> Path:
     return _repo_root() / 'project' / 'f1_prediction_system' / 'final_predictions'
 
 
+# smart_cleanup writes Parquet when pyarrow is available and CSV otherwise;
+# the prediction endpoints accept either so the handoff works in both setups
+_PREDICTION_SUFFIXES = ('.csv', '.parquet')
+
+
+def _read_predictions_file(path: Path):
+    """Parse a smart_cleanup output file, CSV or Parquet"""
+    import pandas as pd
+    if path.suffix == '.parquet':
+        return pd.read_parquet(path)
+    return pd.read_csv(path)
+
+
+def _latest_prediction_file(race_name: str):
+    """The latest_<race> alias, preferring the most recently written format
+
+    Checking both suffixes and taking the newer one also covers a stale
+    pre-Parquet CSV alias sitting next to a fresher .parquet file.
+    """
+    candidates = [p for p in (_final_predictions_dir() / f"latest_{race_name}{suffix}"
+                              for suffix in _PREDICTION_SUFFIXES) if p.exists()]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda p: p.stat().st_mtime_ns)
+
+
+def _results_prediction_files(pattern: str) -> list:
+    """Name-sorted results_* files in either output format"""
+    return sorted(p for p in _final_predictions_dir().glob(pattern)
+                  if p.suffix in _PREDICTION_SUFFIXES)
+
+
 def _calibration_metrics_file() -> Path:
     env_path = os.environ.get('CALIBRATION_METRICS_FILE')
     if env_path:
@@ -588,25 +811,58 @@ def _track_features_file() -> Path:
     return _repo_root() / 'project' / 'f1_prediction_system' / 'data' / 'raw' / 'track_features.csv'
 
 
+# Parsed track_features.csv plus its precomputed match columns, keyed by
+# file mtime so an updated CSV is re-read on the next request
+_track_df_cache = None
+_track_df_mtime = 0
+
+
+def _track_features_df():
+    """(frame, lowercased name columns, event-id strings) or None
+
+    The CSV is parsed once and the string normalizations used for
+    matching are computed with it, instead of re-reading and
+    re-lowercasing per request.
+    """
+    import pandas as pd
+    global _track_df_cache, _track_df_mtime
+    tf = _track_features_file()
+    try:
+        stat = tf.stat()
+    except OSError:
+        _track_df_cache = None
+        return None
+    if _track_df_cache is None or _track_df_mtime != stat.st_mtime_ns:
+        tdf = pd.read_csv(tf)
+        name_cols = {col: tdf[col].astype(str).str.lower()
+                     for col in ('track_name', 'circuit', 'race', 'race_name')
+                     if col in tdf.columns}
+        event_ids = tdf['event_id'].astype(str) if 'event_id' in tdf.columns else None
+        _track_df_cache = (tdf, name_cols, event_ids)
+        _track_df_mtime = stat.st_mtime_ns
+    return _track_df_cache
+
+
 def _load_track_row(race_name: str, date_str: str | None) -> dict:
     try:
-        tf = _track_features_file()
-        if not tf.exists():
+        cached = _track_features_df()
+        if cached is None:
             return {}
-        tdf = pd.read_csv(tf)
+        tdf, name_cols, event_ids = cached
         if tdf.empty:
             return {}
         # try to match by date first if present
-        if date_str and 'event_id' in tdf.columns and tdf['event_id'].astype(str).str.contains(date_str, na=False).any():
-            row = tdf[tdf['event_id'].astype(str).str.contains(date_str, na=False)].iloc[0].to_dict()
-            return row
+        if date_str and event_ids is not None:
+            mask = event_ids.str.contains(date_str, na=False)
+            if mask.any():
+                return tdf[mask].iloc[0].to_dict()
         # fallback: match by track_name containing part of race_name
         name_key = race_name.split(' Grand Prix')[0] if 'Grand Prix' in race_name else race_name
-        for col in ['track_name', 'circuit', 'race', 'race_name']:
-            if col in tdf.columns:
-                mask = tdf[col].astype(str).str.lower().str.contains(name_key.lower())
-                if mask.any():
-                    return tdf[mask].iloc[0].to_dict()
+        name_key = name_key.lower()
+        for lowered in name_cols.values():
+            mask = lowered.str.contains(name_key)
+            if mask.any():
+                return tdf[mask].iloc[0].to_dict()
         return {}
     except Exception:
         return {}
@@ -624,21 +880,94 @@ def _load_calibration_metrics() -> dict:
     return {}
 
 
-@app.route('/predictions/latest', methods=['GET'])
-def latest_predictions():
+def _rows_to_predictions(work_df, driver_col, team_col, win_col, podium_col) -> list:
+    """Sorted prediction rows as a list of response dicts
+
+    Whole-column ndarray extraction plus one zip pass replaces the old
+    iterrows() loop, which paid pandas row-boxing overhead per driver.
+    Values ≤ 1 are treated as probabilities and scaled to percent;
+    unparseable cells count as 0 like the old per-cell fallback did.
+    """
+    import pandas as pd
+    driver_names = work_df[driver_col].astype(str).to_numpy()
+    teams = work_df[team_col].astype(str).to_numpy() if team_col else None
+
+    win_arr = pd.to_numeric(work_df[win_col], errors='coerce').fillna(0.0).to_numpy(np.float64)
+    pct = np.where(win_arr <= 1.0, win_arr * 100.0, win_arr)
+
+    fallback_podium = np.clip(np.round(pct * 2.5, 2), 0.0, 100.0)
+    if podium_col:
+        pod_raw = pd.to_numeric(work_df[podium_col], errors='coerce').to_numpy(np.float64)
+        pod_pct = np.where(pod_raw <= 1.0, pod_raw * 100.0, pod_raw)
+        podium = np.where(np.isnan(pod_raw), fallback_podium, pod_pct)
+    else:
+        podium = fallback_podium
+
+    return [
+        {
+            'driverId': name.lower().replace(' ', '_'),
+            'driverName': name,
+            'team': teams[idx] if teams is not None else 'Unknown',
+            'winProbPct': round(float(pct[idx]), 2),
+            'podiumProbPct': round(float(podium[idx]), 2),
+            'position': idx + 1
+        }
+        for idx, name in enumerate(driver_names)
+    ]
+
+
+# /predictions/latest response cache: (race, source file) → (mtime_ns, response).
+# Keying on the source mtime means a smart_cleanup rewrite invalidates the
+# entry automatically, while a polling frontend hits the cache in between.
+_LATEST_CACHE_MAX = 32
+_latest_pred_cache = {}
+
+
+def _latest_cache_lookup(race_name: str, path: Path):
+    """(mtime_ns, cached response or None) for a race/source pair"""
+    try:
+        mtime_ns = path.stat().st_mtime_ns
+    except OSError:
+        return None, None
+    entry = _latest_pred_cache.get((race_name, str(path)))
+    if entry is not None and entry[0] == mtime_ns:
+        return mtime_ns, entry[1]
+    return mtime_ns, None
+
+
+def _latest_cache_store(race_name: str, path: Path, mtime_ns, response: dict):
+    if mtime_ns is None:
+        return
+    if len(_latest_pred_cache) >= _LATEST_CACHE_MAX:
+        # dicts iterate in insertion order — drop the oldest entry
+        _latest_pred_cache.pop(next(iter(_latest_pred_cache)))
+    _latest_pred_cache[(race_name, str(path))] = (mtime_ns, response)
+
+
+def _compute_latest(race_name: str):
+    """(payload dict, HTTP status) for /predictions/latest
+
+    Runs the full resolve/parse/build pipeline, consulting and feeding
+    the mtime-keyed response cache. Called from the request handler on a
+    cache miss and from the background refresher to keep the cache warm.
+    """
+    import pandas as pd
     try:
-        race_name = request.args.get('race', default='Monaco Grand Prix', type=str)
-        # Build path to latest CSV produced by smart_cleanup: latest_<race>.csv
-        filename = f"latest_{race_name}.csv"
-        csv_path = _final_predictions_dir() / filename
+        # Latest alias produced by smart_cleanup: latest_<race>.csv/.parquet
+        csv_path = _latest_prediction_file(race_name)
 
-        if not csv_path.exists():
+        if csv_path is None:
             # Fallback: try to find a results_ file for this race
-            candidates = sorted(_final_predictions_dir().glob(f"results_{race_name}_*.csv"))
-            if not candidates:
+            candidates = _results_prediction_files(f"results_{race_name}_*")
+            if candidates:
+                csv_path = candidates[-1]
+            else:
                 # Fallback 2: use aggregated multi-race predictions and filter by race
                 multi = _multi_race_predictions_file()
                 if multi.exists():
+                    multi_mtime, cached = _latest_cache_lookup(race_name, multi)
+                    if cached is not None:
+                        return cached, 200
                     df_all = pd.read_csv(multi)
                     race_col = None
                     for c in df_all.columns:
@@ -646,14 +975,14 @@ def latest_predictions():
                             race_col = c
                             break
                     if race_col is None or df_all.empty:
-                        return jsonify({'success': False, 'error': 'Aggregated predictions missing race column'}), 500
+                        return {'success': False, 'error': 'Aggregated predictions missing race column'}, 500
                     mask = df_all[race_col].astype(str).str.lower().str.contains(race_name.lower())
                     df = df_all[mask].copy()
                     if df.empty:
                         mask2 = df_all[race_col].astype(str).str.strip().str.casefold() == race_name.strip().casefold()
                         df = df_all[mask2].copy()
                     if df.empty:
-                        return jsonify({'success': False, 'error': f'No rows for race {race_name} in aggregated predictions'}), 404
+                        return {'success': False, 'error': f'No rows for race {race_name} in aggregated predictions'}, 404
                     # proceed with df directly
                     work_df = df
                     driver_col = next((c for c in work_df.columns if c.lower() in ('driver','driver_name','name')), None)
@@ -666,23 +995,9 @@ def latest_predictions():
                                 win_col = c
                                 break
                     if driver_col is None or win_col is None:
-                        return jsonify({'success': False, 'error': 'Required columns not found in aggregated predictions'}), 500
+                        return {'success': False, 'error': 'Required columns not found in aggregated predictions'}, 500
                     work_df = work_df.sort_values(win_col, ascending=False).reset_index(drop=True)
-                    def to_pct(x):
-                        try:
-                            return float(x) * 100.0 if float(x) <= 1.0 else float(x)
-                        except Exception:
-                            return 0.0
-                    predictions_all = []
-                    for idx, row in work_df.iterrows():
-                        predictions_all.append({
-                            'driverId': str(row.get(driver_col)).lower().replace(' ', '_'),
-                            'driverName': str(row.get(driver_col)),
-                            'team': str(row.get(team_col)) if team_col else 'Unknown',
-                            'winProbPct': round(to_pct(row.get(win_col)), 2),
-                            'podiumProbPct': round(to_pct(row.get(podium_col)) if podium_col and pd.notna(row.get(podium_col)) else max(0.0, min(100.0, round(to_pct(row.get(win_col)) * 2.5, 2))), 2),
-                            'position': idx + 1
-                        })
+                    predictions_all = _rows_to_predictions(work_df, driver_col, team_col, win_col, podium_col)
                     top3 = predictions_all[:3]
                     metrics = _load_calibration_metrics()
                     accuracy = metrics.get('overall_accuracy_pct') or metrics.get('accuracy_pct') or 88
@@ -706,17 +1021,22 @@ def latest_predictions():
                             'lr': 0.1
                         }
                     }
-                    return jsonify(response)
+                    _latest_cache_store(race_name, multi, multi_mtime, response)
+                    return response, 200
                 else:
                     # Final fallback: use most recent predictions file in the directory
-                    any_results = sorted(_final_predictions_dir().glob("results_*.csv"))
+                    any_results = _results_prediction_files("results_*")
                     if not any_results:
-                        return jsonify({'success': False, 'error': f'No predictions found (race={race_name})'}), 404
+                        return {'success': False, 'error': f'No predictions found (race={race_name})'}, 404
                     csv_path = any_results[-1]
 
-        df = pd.read_csv(csv_path)
+        csv_mtime, cached = _latest_cache_lookup(race_name, csv_path)
+        if cached is not None:
+            return cached, 200
+
+        df = _read_predictions_file(csv_path)
         if df.empty:
-            return jsonify({'success': False, 'error': 'Prediction file is empty'}), 500
+            return {'success': False, 'error': 'Prediction file is empty'}, 500
 
         # Normalize expected columns
         # columns may include: race, driver, team, win_prob, podium_prob, points_prob
@@ -734,28 +1054,12 @@ def latest_predictions():
         podium_col = get_col(['podium_prob', 'Podium Probability', 'podiumProb'])
 
         if not driver_col or not win_col:
-            return jsonify({'success': False, 'error': 'Required columns not found in predictions CSV'}), 500
+            return {'success': False, 'error': 'Required columns not found in predictions CSV'}, 500
 
         # Sort by win probability desc
         df_sorted = df.sort_values(win_col, ascending=False).reset_index(drop=True)
 
-        def to_pct(x):
-            try:
-                # treat values <= 1 as probabilities, otherwise already percent
-                return float(x) * 100.0 if float(x) <= 1.0 else float(x)
-            except Exception:
-                return 0.0
-
-        predictions_all = []
-        for idx, row in df_sorted.iterrows():
-            predictions_all.append({
-                'driverId': str(row.get(driver_col)).lower().replace(' ', '_'),
-                'driverName': str(row.get(driver_col)),
-                'team': str(row.get(team_col)) if team_col else 'Unknown',
-                'winProbPct': round(to_pct(row.get(win_col)), 2),
-                'podiumProbPct': round(to_pct(row.get(podium_col)) if podium_col and pd.notna(row.get(podium_col)) else max(0.0, min(100.0, round(to_pct(row.get(win_col)) * 2.5, 2))), 2),
-                'position': idx + 1
-            })
+        predictions_all = _rows_to_predictions(df_sorted, driver_col, team_col, win_col, podium_col)
 
         top3 = predictions_all[:3]
 
@@ -784,9 +1088,52 @@ def latest_predictions():
             }
         }
 
-        return jsonify(response)
+        _latest_cache_store(race_name, csv_path, csv_mtime, response)
+        return response, 200
     except Exception as e:
-        return jsonify({'success': False, 'error': str(e)}), 500
+        return {'success': False, 'error': str(e)}, 500
+
+
+# Background refresher: recompute the known races every cycle so polling
+# requests nearly always land on the warm mtime-keyed cache instead of
+# paying for CSV parse + response build on the request thread
+_REFRESH_INTERVAL = 30.0
+_refresher_started = False
+_refresher_lock = threading.Lock()
+
+
+def _prediction_refresher():
+    while True:
+        for race in TRACK_CHARACTERISTICS:
+            try:
+                _compute_latest(race)
+            except Exception as e:
+                logger.warning(f"Prediction refresh failed for {race}: {e}")
+        time.sleep(_REFRESH_INTERVAL)
+
+
+@app.before_request
+def _ensure_refresher():
+    # Started lazily so each gunicorn worker (post-fork) gets its own
+    # thread; a daemon started in the preloading master would not
+    # survive the fork
+    global _refresher_started
+    if _refresher_started:
+        return
+    with _refresher_lock:
+        if not _refresher_started:
+            threading.Thread(target=_prediction_refresher, daemon=True,
+                             name='latest-pred-refresher').start()
+            _refresher_started = True
+
+
+@app.route('/predictions/latest', methods=['GET'])
+def latest_predictions():
+    race_name = request.args.get('race', default='Monaco Grand Prix', type=str)
+    payload, status = _compute_latest(race_name)
+    if status == 200:
+        return fast_jsonify(payload)
+    return jsonify(payload), status
 
 
 @app.route('/predictions/race', methods=['GET'])
@@ -794,12 +1141,13 @@ def predictions_by_race():
     """Serve per-race predictions with dynamic weather/track details.
     Query params: name=<race name>, date=<YYYY-MM-DD>
     Sources priority:
-      1) final_predictions/latest_<name>.csv
-      2) final_predictions/results_<name>_*.csv
+      1) final_predictions/latest_<name>.csv or .parquet
+      2) final_predictions/results_<name>_*.csv or .parquet
       3) processed calibrated: data/processed/calibrated_*.csv (match by date or name)
       4) aggregated fallback files
       5) dynamic generation for missing races
     """
+    import pandas as pd
     try:
         race_name = request.args.get('name', type=str)
         date_str = request.args.get('date', default=None, type=str)
@@ -807,16 +1155,15 @@ def predictions_by_race():
             return jsonify({'success': False, 'error': 'Missing race name'}), 400
 
         # 1/2: reuse latest endpoint resolution pathing
-        filename = f"latest_{race_name}.csv"
-        csv_path = _final_predictions_dir() / filename
+        csv_path = _latest_prediction_file(race_name)
         df = None
-        if csv_path.exists():
-            df = pd.read_csv(csv_path)
+        if csv_path is not None:
+            df = _read_predictions_file(csv_path)
             logger.info(f"✅ Found existing predictions for {race_name}")
         else:
-            candidates = sorted(_final_predictions_dir().glob(f"results_{race_name}_*.csv"))
+            candidates = _results_prediction_files(f"results_{race_name}_*")
             if candidates:
-                df = pd.read_csv(candidates[-1])
+                df = _read_predictions_file(candidates[-1])
                 logger.info(f"✅ Found historical predictions for {race_name}")
 
         # 3) processed calibrated
@@ -976,10 +1323,18 @@ def predictions_by_race():
                 'lr': 0.1
             }
         }
-        return jsonify(payload)
+        return fast_jsonify(payload)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+# Load the model and reference data at import time. Under
+#   gunicorn -w 4 --preload -k gthread --threads 2 app:app
+# this runs once in the master process and the forked workers share the
+# booster, stats frames and lookup dicts copy-on-write instead of each
+# re-reading them (the dev server below gets the same eager load).
+load_ml_model()
+load_driver_data()
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 8000))
     app.run(host='0.0.0.0', port=port, debug=True)